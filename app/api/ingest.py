@@ -5,17 +5,50 @@ ingest.py
 - URL / 텍스트 / PDF 파일 업로드를 지원
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from app.services.vectorstore import VectorStoreService
+from typing import Annotated, List, Optional
+from app.services.vectorstore import VectorStoreService, get_vectorstore_service, load_file
 
 
 # FastAPI 라우터
 router = APIRouter(prefix="/ingest", tags=["Ingestion"])
 
-# VectorStore 서비스 (Chroma + Embeddings)
-vs = VectorStoreService()
+# VectorStore 서비스 (Chroma + Embeddings) - RAG 체인과 같은 공용 인스턴스를 요청 시점에 주입
+# (import 시 만들지 않음 → 앱 시작 시 Chroma 클라이언트/임베딩 생성 비용 없음)
+VectorStore = Annotated[VectorStoreService, Depends(get_vectorstore_service)]
+
+# 이벤트 루프를 막지 않도록 수집 작업을 외부 풀로 넘긴다
+# - _cpu_pool(): 폴더 수집 시 파일 파싱 등 CPU 바운드 작업 (프로세스 단위 병렬, 처음 쓸 때 생성)
+# - IO_POOL   : 업로드 임시 파일 쓰기 (디스크 I/O)
+# 분할/임베딩/저장은 vs.aadd_* (aembed_documents + asyncio.gather)로 이벤트 루프에서 직접 await
+IO_POOL = ThreadPoolExecutor(max_workers=4)
+_CPU_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@lru_cache(maxsize=1)
+def _cpu_pool() -> ProcessPoolExecutor:
+    # spawn: 스레드가 도는 API 프로세스를 fork하면 자식이 잠긴 락에서 멈출 수 있음
+    return ProcessPoolExecutor(max_workers=_CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _spool_upload(file: UploadFile) -> str:
+    """
+    업로드 스트림을 1MB 단위로 임시 파일에 복사하고 경로 반환
+    (await file.read()처럼 PDF 전체를 메모리에 올리지 않음)
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        shutil.copyfileobj(file.file, tmp, length=1 << 20)
+        return tmp.name
 
 
 # -------------------------------------------------------------
@@ -34,14 +67,14 @@ class IngestRequest(BaseModel):
 # 1️⃣ URL 수집 API
 # -------------------------------------------------------------
 @router.post("/urls")
-async def ingest_urls(req: IngestRequest):
+async def ingest_urls(req: IngestRequest, vs: VectorStore):
     """
     지정된 URL에서 문서를 로드하여 분할/임베딩 후 벡터스토어에 추가.
     """
     try:
         if not req.urls:
             raise HTTPException(status_code=400, detail="urls 필드가 필요합니다.")
-        count = vs.add_from_urls(req.collection, req.urls)
+        count = await vs.aadd_from_urls(req.collection, req.urls)
         return {"ok": True, "added": count, "collection": req.collection}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -51,14 +84,14 @@ async def ingest_urls(req: IngestRequest):
 # 2️⃣ 텍스트 수집 API
 # -------------------------------------------------------------
 @router.post("/texts")
-async def ingest_texts(req: IngestRequest):
+async def ingest_texts(req: IngestRequest, vs: VectorStore):
     """
     원시 텍스트 리스트를 벡터스토어에 추가.
     """
     try:
         if not req.texts:
             raise HTTPException(status_code=400, detail="texts 필드가 필요합니다.")
-        count = vs.add_from_texts(req.collection, req.texts)
+        count = await vs.aadd_from_texts(req.collection, req.texts)
         return {"ok": True, "added": count, "collection": req.collection}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -69,17 +102,22 @@ async def ingest_texts(req: IngestRequest):
 # -------------------------------------------------------------
 @router.post("/pdf")
 async def ingest_pdf(
+    vs: VectorStore,
     collection: str = "default",
     file: UploadFile = File(..., description="업로드할 PDF 파일"),
 ):
     """
     PDF 파일을 업로드 받아, 분할/임베딩 후 벡터스토어에 추가.
+    - 업로드 본문은 임시 파일로 스트리밍 → 페이지 배치(add_from_pdf_path)로 처리해서 대용량 PDF도 메모리 상한 유지
     """
+    tmp_path = None
     try:
         if file.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="PDF 파일만 허용됩니다.")
-        content = await file.read()
-        count = vs.add_from_pdf_bytes(collection, content, file.filename)
+        loop = asyncio.get_running_loop()
+        tmp_path = await loop.run_in_executor(IO_POOL, _spool_upload, file)
+        # 페이지 배치 단위로 추출 → 분할/임베딩/저장 (문서 전체 텍스트를 한 번에 들고 있지 않음)
+        count = await asyncio.to_thread(vs.add_from_pdf_path, collection, tmp_path, source=file.filename)
         return {
             "ok": True,
             "added": count,
@@ -88,6 +126,9 @@ async def ingest_pdf(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
 
 
 # -------------------------------------------------------------
@@ -95,21 +136,37 @@ async def ingest_pdf(
 # -------------------------------------------------------------
 @router.post("/directory")
 async def ingest_directory(
+    vs: VectorStore,
     dir_path: str,
     collection: str = "default",
 ):
     """
     로컬 폴더 내 모든 문서를 일괄 수집.
     주로 관리자/개발자용 (운영서버에선 안전한 경로만 허용)
+    - 파일별 로딩을 프로세스 풀에 동시에 던져서 N개 문서를 병렬 파싱
     """
+    root = Path(dir_path)
+    if not root.is_dir():
+        raise HTTPException(status_code=404, detail=f"폴더를 찾을 수 없습니다: {dir_path}")
     try:
-        count = vs.add_from_directory(collection, dir_path)
+        # 숨김 파일/폴더(.git, .DS_Store, 에디터 스왑 파일 등)는 제외 - 경로 중 한 부분이라도 '.'으로 시작하면 건너뜀
+        paths = [
+            str(p)
+            for p in root.glob("**/*")
+            if p.is_file() and not any(part.startswith(".") for part in p.relative_to(root).parts)
+        ]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(_cpu_pool(), load_file, path) for path in paths]
+        )
+        docs = [d for file_docs in results for d in file_docs]
+        count = await vs.aadd_documents(collection, docs)
         return {"ok": True, "added": count, "collection": collection, "dir": dir_path}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/count-all")
-async def count_all(collection: str = Query(...)):
+async def count_all(vs: VectorStore, collection: str = Query(...)):
     try:
         chunk_count = vs.count(collection)
         doc_count = vs.count_documents(collection)
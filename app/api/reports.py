@@ -4,20 +4,30 @@ reports.py
 - FastAPI 엔드포인트 정의
 - 1. 해양 사고 데이터를 기반으로 보험 청구 보고서를 자동 생성 (비동기) -> 안다미로 핵심 ai 보고서 생성 라우터
 - 2. 보고서 PDF 다운로드 
-- 3,4. 자유 질문 QA (선택)
+- 3,4. 자유 질문 QA (선택) - /chat(JSON), /chat/stream(스트리밍)
+
+환경변수:
+- REDIS_URL: 설정 시 보고서 생성을 arq 작업 큐(app/worker.py)로 넘김, 미설정 시 같은 프로세스의 BackgroundTasks 사용
 """
 
+import asyncio
 import os
 import uuid
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from pydantic import BaseModel, ValidationError
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, ORJSONResponse, RedirectResponse, Response, StreamingResponse
 from app.models.report_models import (
     ReportGenerationRequest,
     ReportResponse,
+    IncidentData,
     IncidentReportRequest,
     ReportTaskResponse,
+    ReportTaskStruct,
 )
 from app.services.report_service import ReportService, InsuranceReportService
+from app.services.report_store import get_report_store
+from app.services import task_registry
 
 # FastAPI 라우터 객체
 router = APIRouter()
@@ -26,18 +36,99 @@ router = APIRouter()
 qa_service = ReportService()
 insurance_service = InsuranceReportService()
 
+# 태스크 응답 기본 메시지 (ReportTaskResponse.message 기본값과 동일)
+_TASK_STARTED = ReportTaskResponse.model_fields["message"].default
+
+# msgspec 설치 시 태스크 응답을 Struct로 인코딩 (없으면 orjson)
+_task_encoder = None
+if ReportTaskStruct is not None:
+    import msgspec
+
+    _task_encoder = msgspec.json.Encoder()
+
+# 작업 큐 (REDIS_URL 설정 시에만 사용, 최초 요청 때 연결)
+_arq_pool = None
+
+
+async def _enqueue(background_tasks: BackgroundTasks, job: str, func, task_id: str, **kwargs):
+    """
+    보고서 생성 작업 등록
+    - REDIS_URL 있음: arq 큐에 job_id=task_id로 등록 → 별도 워커 프로세스가 처리
+    - REDIS_URL 없음: 기존처럼 BackgroundTasks로 API 프로세스에서 처리
+    """
+    global _arq_pool
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        # 같은 프로세스에서 실행되므로 태스크 상태를 레지스트리로 추적
+        task_registry.mark_pending(task_id)
+        background_tasks.add_task(_run_tracked, func, task_id=task_id, **kwargs)
+        return
+
+    if _arq_pool is None:
+        from arq import create_pool
+        from arq.connections import RedisSettings
+
+        _arq_pool = await create_pool(RedisSettings.from_dsn(redis_url))
+    await _arq_pool.enqueue_job(job, task_id=task_id, _job_id=task_id, **kwargs)
+
+
+async def _parse_body(request: Request, model: type[BaseModel]) -> BaseModel:
+    """
+    원본 요청 바이트를 pydantic-core로 바로 파싱+검증 (json.loads → dict → 검증 두 단계 생략)
+    - 실패 시 FastAPI 기본 바디 검증과 같은 422 응답
+    """
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        # FastAPI 기본 바디 검증과 같은 에러 모양: loc 앞에 "body"
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
+
+def _body_schema(model: type[BaseModel]) -> dict:
+    # 바디를 직접 파싱하는 라우트도 OpenAPI 문서에 요청 스키마가 보이도록
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": model.model_json_schema()}}}}
+
+
+def _task_response(task_id: str) -> Response:
+    """
+    보고서 생성 태스크 응답 (task_id + 시작 메시지)
+    """
+    if _task_encoder is None:
+        return ORJSONResponse({"task_id": task_id, "message": _TASK_STARTED})
+    return Response(content=_task_encoder.encode(ReportTaskStruct(task_id=task_id)), media_type="application/json")
+
+
+def _run_tracked(func, task_id: str, **kwargs):
+    """
+    백그라운드 태스크 실행 + 완료/실패를 task_registry에 기록
+    """
+    try:
+        path = func(task_id=task_id, **kwargs)
+    except Exception as e:
+        task_registry.mark_failed(task_id, str(e))
+        raise
+    task_registry.mark_done(task_id, path)
+
+
 # ---------------------------------------------------------------------
 # 1. 사고 데이터 기반 해양 보험 청구 보고서 생성 (RAG + ReportChain)
 # ---------------------------------------------------------------------
-@router.post("/generate/insurance", response_model=ReportTaskResponse)
-async def generate_insurance_report(req: IncidentReportRequest, background_tasks: BackgroundTasks):
+@router.post(
+    "/generate/insurance",
+    response_model=ReportTaskResponse,
+    openapi_extra=_body_schema(IncidentReportRequest),
+)
+async def generate_insurance_report(request: Request, background_tasks: BackgroundTasks):
     """
     해양 사고 데이터를 기반으로 보험 청구 보고서를 자동 생성한다.
     사고 유형별 템플릿 및 법령 기반 RAG 검색을 포함한다.
     """
+    req = await _parse_body(request, IncidentReportRequest)
     try:
         task_id = str(uuid.uuid4())
-        incident_data = {
+        incident_data: IncidentData = {
             "incident_type": req.incident_type,
             "description": req.description,
             "location": req.location,
@@ -45,20 +136,24 @@ async def generate_insurance_report(req: IncidentReportRequest, background_tasks
             "language": req.language,
         }
 
-        background_tasks.add_task(
+        await _enqueue(
+        background_tasks,
+        "generate_insurance_report_pdf",
         insurance_service.generate_insurance_report_pdf,
         task_id=task_id,
         incident_data=incident_data,
         incident_type=req.incident_type,
         use_rag=req.use_rag,
         collection=req.collection,
+        collections=req.collections,
         top_k=req.top_k,
         title=req.title,
         model=req.model,
         temperature=0.1,
         )
 
-        return ReportTaskResponse(task_id=task_id)
+        # response_model은 문서(OpenAPI)용으로만 두고, 응답은 바로 직렬화 (jsonable_encoder/재검증 생략)
+        return _task_response(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -70,8 +165,26 @@ async def generate_insurance_report(req: IncidentReportRequest, background_tasks
 async def download_report(task_id: str):
     """
     생성 완료된 PDF 보고서를 다운로드.
+    - 이 프로세스에서 실행된 태스크는 레지스트리 조회 한 번으로 응답 (생성 중이면 202)
+    - 오브젝트 스토리지 사용 시 presigned URL로 302 리다이렉트 (API 프로세스가 파일을 중계하지 않음)
     """
-    # 보험 보고서 → QA 보고서 순으로 경로 확인
+    record = task_registry.get_task(task_id)
+    if record is not None:
+        if record.status == task_registry.PENDING:
+            return ORJSONResponse(status_code=202, content={"task_id": task_id, "status": record.status})
+        if record.status == task_registry.FAILED:
+            raise HTTPException(status_code=500, detail=f"보고서 생성 실패: {record.error}")
+        # 파일이 정리(삭제)됐으면 아래 경로 확인으로 넘어가서 404
+        if get_report_store() is None and os.path.exists(record.path):
+            return FileResponse(record.path, media_type="application/pdf", filename=os.path.basename(record.path))
+
+    store = get_report_store()
+    if store is not None:
+        url = await asyncio.to_thread(store.presigned_url, task_id)  # boto3는 동기 호출
+        if url:
+            return RedirectResponse(url, status_code=302)
+
+    # 보험 보고서 → QA 보고서 순으로 경로 확인 (저장 기록이 있어도 파일이 지워졌을 수 있으므로 존재 여부는 항상 확인)
     path = insurance_service.get_report_path(task_id) or qa_service.get_report_path(task_id)
     if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail="보고서를 찾을 수 없습니다.")
@@ -88,7 +201,9 @@ async def chat(req: ReportGenerationRequest):
     자유 질문에 대해 RAG 기반 QA를 수행.
     """
     try:
-        answer, _sid = qa_service.qa_with_memory(
+        # 검색/LLM 호출이 동기 코드이므로 스레드로 넘겨 이벤트 루프를 막지 않는다
+        answer, _sid = await asyncio.to_thread(
+            qa_service.qa_with_memory,
             question=req.question,
             session_id=None,
             collection=req.collection,
@@ -101,6 +216,36 @@ async def chat(req: ReportGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(req: ReportGenerationRequest):
+    """
+    /chat의 스트리밍 버전 - 답변 전체를 기다리지 않고 LLM 토큰이 생성되는 대로 전송 (text/plain)
+    - 첫 조각까지는 여기서 받아본 뒤 응답을 시작 → 검색/LLM 연결 실패는 200이 아닌 500으로 응답
+    - 응답 시작 후의 오류는 상태 코드를 바꿀 수 없으므로 연결을 끊어 (불완전한 chunked 응답) 정상 종료와 구분되게 함
+    """
+    stream = qa_service.qa_with_memory_stream(
+        question=req.question,
+        session_id=None,
+        collection=req.collection,
+        top_k=req.top_k,
+        model=req.model,
+        temperature=req.temperature,
+    )
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
 # ---------------------------------------------------------------------
 # 4. 자유 질문 → 보고서 PDF 생성 (비동기) - 아직 질문까지는 만들지 않았음. 추후 추가 예정
 # ---------------------------------------------------------------------
@@ -111,7 +256,9 @@ async def generate_report(req: ReportGenerationRequest, background_tasks: Backgr
     """
     try:
         task_id = str(uuid.uuid4())
-        background_tasks.add_task(
+        await _enqueue(
+            background_tasks,
+            "generate_and_save_report",
             qa_service.generate_and_save_report,
             task_id=task_id,
             question=req.question,
@@ -122,7 +269,7 @@ async def generate_report(req: ReportGenerationRequest, background_tasks: Backgr
             model=req.model,
             temperature=req.temperature,
         )
-        return ReportTaskResponse(task_id=task_id)
+        return _task_response(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -16,14 +16,96 @@ RAGChain - Retrieval-Augmented Generation (검색 기반 생성 체인)
 
 """
 
-from typing import List, Optional
-from langchain_openai import ChatOpenAI
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, FrozenSet, List, Optional, Sequence
+
+import tiktoken
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableSequence
 
-from app.services.vectorstore import VectorStoreService
+from app.services.llm import get_llm
+from app.services.vectorstore import get_vectorstore_service
+from app.services.llm_cache import SemanticCache, cache_enabled
+
+
+# deprecated max_context_len(글자 수) → 토큰 수 환산 비율 (기본 3000자 ≈ 1000토큰)
+_CHARS_PER_TOKEN = 3
+
+# 여러 컬렉션 동시 검색용 스레드 풀 (Chroma 파이썬 API는 동기이므로 스레드로 병렬화)
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+# RAG 프롬프트 (고정 골격)
+_RAG_PROMPT = """
+너는 해양 보험 청구 보고서 작성 보조 AI다.
+아래 [검색 문맥]에 포함된 정보를 사실 기반으로 사용하여 질문에 답하라.
+만약 관련 정보가 없다면 "근거 부족"이라고 답하라.
+가능하면 문서 출처를 요약해서 하단에 정리하라.
+
+[검색 문맥]
+{context}
+
+[질문]
+{question}
+"""
+
+
+@lru_cache(maxsize=64)
+def _compile_prompt(template: str) -> ChatPromptTemplate:
+    """
+    템플릿 문자열 → ChatPromptTemplate 컴파일 결과 캐시
+    (RAGChain을 새로 만들 때마다 {변수} 파싱을 다시 하지 않도록)
+    """
+    return ChatPromptTemplate.from_template(template)
+
+
+@lru_cache(maxsize=8)
+def _encoder(model: str) -> tiktoken.Encoding:
+    """
+    모델별 tiktoken 인코더 (생성 비용이 커서 프로세스당 1회만 생성)
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")  # gpt-4o 계열 기본 인코딩
+
+
+@lru_cache(maxsize=8)
+def _template_tokens(model: str) -> int:
+    """
+    프롬프트 고정 골격의 토큰 수 (문맥 예산 계산용)
+    """
+    return len(_encoder(model).encode(_RAG_PROMPT))
+
+
+def _shingles(text: str, n: int = 5) -> FrozenSet[str]:
+    """
+    공백 정규화 후 글자 n-gram 집합
+    """
+    t = " ".join(text.split())
+    return frozenset(t[i : i + n] for i in range(max(len(t) - n + 1, 1)))
+
+
+def _dedup_near_duplicates(docs: Sequence[Document], threshold: float) -> List[Document]:
+    """
+    검색된 청크 중 거의 같은 내용(5-gram Jaccard ≥ threshold)은 처음 것만 남김
+    - 법령/약관은 조문마다 반복되는 상용구가 많아, 중복을 빼면 같은 토큰 예산에 더 많은 정보가 들어감
+    - top_k 수준(수십 개 이하)에서는 MinHash 근사보다 정확한 Jaccard 쌍 비교가 더 빠름
+    """
+    kept: List[Document] = []
+    kept_shingles: List[FrozenSet[str]] = []
+    for d in docs:
+        sh = _shingles(d.page_content)
+        if any(len(sh & other) / len(sh | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(d)
+        kept_shingles.append(sh)
+    return kept
 
 
 class RAGChain:
@@ -33,9 +115,14 @@ class RAGChain:
         top_k: int = 4,
         model: str = "gpt-4o-mini",
         temperature: float = 0.2,
-        max_context_len: int = 3000,
+        collections: Optional[List[str]] = None,
+        max_context_tokens: int = 1000,
+        max_prompt_tokens: int = 8000,
         include_sources: bool = True,
+        use_cache: bool = True,
+        dedup_threshold: Optional[float] = 0.85,
         debug: bool = False,
+        max_context_len: Optional[int] = None,
     ):
         """
         RAG 체인 초기화
@@ -44,41 +131,51 @@ class RAGChain:
             top_k: 검색 문서 개수
             model: 사용할 OpenAI LLM 모델명
             temperature: 창의성 (낮을수록 객관적)
-            max_context_len: 프롬프트에 넣을 최대 문맥 길이
+            collections: 함께 검색할 컬렉션 목록 (예: 법령 + 약관 + 판례). 없으면 [collection]
+            max_context_tokens: 프롬프트에 넣을 검색 문맥의 최대 토큰 수
+                (이전 max_context_len은 글자 수 기준이었음 - 기본 3000자 ≈ 1000토큰으로 환산)
+            max_context_len: (deprecated) 글자 수 기준 문맥 길이 - 주면 약 3글자당 1토큰으로 환산해서 max_context_tokens 대신 사용
+            max_prompt_tokens: 프롬프트 전체(골격 + 문맥 + 질문) 최대 토큰 수
             include_sources: 결과 하단에 문서 출처 요약 포함 여부
+            use_cache: True면 의미 기반 캐시(SemanticCache)로 유사 질문의 답변 재사용
+            dedup_threshold: 검색 청크 간 유사도가 이 값 이상이면 중복으로 보고 제거 (None이면 끔)
             debug: True면 검색된 문서 및 context 콘솔 출력
         """
         self.collection = collection
+        self.collections = collections or [collection]
         self.top_k = top_k
         self.include_sources = include_sources
         self.debug = debug
-        self.max_context_len = max_context_len
+        if max_context_len is not None:
+            warnings.warn(
+                "max_context_len(글자 수)은 deprecated - max_context_tokens(토큰 수)를 사용하세요",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+            max_context_tokens = max(1, max_context_len // _CHARS_PER_TOKEN)
+        self.max_context_tokens = max_context_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self.dedup_threshold = dedup_threshold
+        self.encoder = _encoder(model)
+        self.template_tokens = _template_tokens(model)
 
-        # (1) 벡터스토어 서비스 로드
-        self.vs = VectorStoreService()
+        # (1) 벡터스토어 서비스 로드 (프로세스 공용 인스턴스)
+        #    - 체인 내부 검색은 self.vs.search (질의 캐시) 사용, retriever는 외부 조합용으로 유지
+        self.vs = get_vectorstore_service()
         self.retriever = self.vs.get_retriever(collection=collection, k=top_k)
 
-        # (2) LLM (OpenAI)
-        self.llm = ChatOpenAI(model=model, temperature=temperature)
+        # (2) LLM (OpenAI) - (model, temperature)별 공용 인스턴스
+        self.llm = get_llm(model, temperature)
+
+        # (2-1) 의미 기반 응답 캐시 - 답변에 영향을 주는 설정이 같을 때만 재사용
+        self.cache = SemanticCache(self.vs, collection, sources=self.collections) if use_cache and cache_enabled() else None
+        self.cache_scope = f"{model}|{temperature}|{top_k}|{include_sources}|{'+'.join(self.collections)}"
 
         # (3) 출력 파서
         self.parser = StrOutputParser()
 
         # (4) 프롬프트 템플릿
-        self.prompt = ChatPromptTemplate.from_template(
-            """
-너는 해양 보험 청구 보고서 작성 보조 AI다.
-아래 [검색 문맥]에 포함된 정보를 사실 기반으로 사용하여 질문에 답하라.
-만약 관련 정보가 없다면 "근거 부족"이라고 답하라.
-가능하면 문서 출처를 요약해서 하단에 정리하라.
-
-[검색 문맥]
-{context}
-
-[질문]
-{question}
-"""
-        )
+        self.prompt = _compile_prompt(_RAG_PROMPT)
 
         # (5) Runnable 시퀀스 구성
         #    question → retriever → prompt → llm → parser
@@ -93,11 +190,28 @@ class RAGChain:
     # 내부 메서드
     # -----------------------------
 
+    def _retrieve(self, question: str) -> List[Document]:
+        """
+        컬렉션 검색 (캐시 사용)
+        - 컬렉션이 여러 개면 동시에 검색한 뒤 코사인 유사도 순으로 병합해서 상위 top_k
+          → 전체 지연이 N×t가 아니라 max(t_i)
+        """
+        if len(self.collections) == 1:
+            return list(self.vs.search(self.collections[0], question, k=self.top_k))
+
+        results = _SEARCH_POOL.map(
+            lambda c: self.vs.search_with_scores(c, question, k=self.top_k), self.collections
+        )
+        merged = sorted((hit for hits in results for hit in hits), key=lambda h: h[1], reverse=True)
+        return [doc for doc, _ in merged[: self.top_k]]
+
     def _context_from_retriever(self, question: str) -> str:
         """
-        Retriever로 문서 검색 → context 문자열 생성
+        벡터스토어 검색(캐시 사용) → context 문자열 생성
         """
-        docs: List[Document] = self.retriever.get_relevant_documents(question)
+        docs = self._retrieve(question)
+        if self.dedup_threshold is not None:
+            docs = _dedup_near_duplicates(docs, self.dedup_threshold)
 
         if self.debug:
             print("\n🔎 [RAG 검색 결과] ----------------------")
@@ -105,10 +219,16 @@ class RAGChain:
                 print(f"• {d.metadata.get('source', 'unknown')}: {d.page_content[:120]}...")
             print("----------------------------------------\n")
 
-        # 문서 내용 합치기
+        # 문서 내용 합치기 - 글자 수가 아닌 토큰 수 기준으로 예산 안에서 자르기
+        # (한국어는 글자당 토큰 비율이 달라 글자 수로 자르면 예산을 넘기거나 낭비함)
         merged = "\n\n".join([d.page_content for d in docs])
-        if len(merged) > self.max_context_len:
-            merged = merged[: self.max_context_len] + "\n\n...(문맥 길이 초과로 일부 생략됨)"
+        budget = min(
+            self.max_context_tokens,
+            self.max_prompt_tokens - self.template_tokens - len(self.encoder.encode(question)),
+        )
+        ids = self.encoder.encode(merged)
+        if len(ids) > budget:
+            merged = self.encoder.decode(ids[: max(budget, 0)]) + "\n\n...(문맥 길이 초과로 일부 생략됨)"
 
         # 문서 출처 추가
         if self.include_sources:
@@ -127,14 +247,47 @@ class RAGChain:
         """
         단일 질문에 대해 RAG 파이프라인 실행.
         검색 + 생성 결과 문자열 반환.
+        - 캐시 히트 시 LLM 호출 없이 저장된 답변 반환, 미스 시 생성 후 캐시에 저장
         """
-        return self.chain.invoke(question)
+        if self.cache is not None:
+            cached = self.cache.check(question, scope=self.cache_scope)
+            if cached is not None:
+                if self.debug:
+                    print("⚡ [RAG 캐시 히트] LLM 호출 생략")
+                return cached
+
+        answer = self.chain.invoke(question)
+
+        if self.cache is not None:
+            self.cache.store(question, answer, scope=self.cache_scope)
+        return answer
+
+    async def arun_stream(self, question: str) -> AsyncIterator[str]:
+        """
+        run()의 스트리밍 버전 - LLM 토큰이 생성되는 대로 문자열 조각을 yield.
+        캐시 히트 시 저장된 답변을 한 번에 yield, 미스 시 스트림 종료 후 전체 답변을 캐시에 저장.
+        """
+        # 캐시 조회/저장은 임베딩 API + Chroma I/O(동기) → 스레드로 넘겨 이벤트 루프를 막지 않음
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.check, question, scope=self.cache_scope)
+            if cached is not None:
+                yield cached
+                return
+
+        parts: List[str] = []
+        async for chunk in self.chain.astream(question):
+            parts.append(chunk)
+            yield chunk
+
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.store, question, "".join(parts), scope=self.cache_scope)
 
     def run_with_sources(self, question: str) -> dict:
         """
         검색된 문서 출처까지 함께 반환하는 버전.
+        - run() 직후 같은 질문이면 검색 결과는 VectorStoreService 캐시에서 재사용
         """
-        docs: List[Document] = self.retriever.get_relevant_documents(question)
+        docs = self._retrieve(question)
         context = "\n\n".join([d.page_content for d in docs])
         answer = self.llm.invoke(self.prompt.format(context=context, question=question)).content
 
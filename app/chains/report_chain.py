@@ -5,91 +5,23 @@ ReportChain
 - 사고 유형별 템플릿 체인 구성 (화재, 유류유출, 충돌, 선원 부상)
 """
 
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Iterator
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 
+from app.services.llm import get_llm
 
-class ReportChain:
-    """
-    사고유형별 보험 청구 보고서 생성용 LangChain 체인
-    """
-
-    def __init__(
-        self,
-        model: str = "gpt-4o-mini",
-        temperature: float = 0.1,
-        debug: bool = False,
-    ):
-        self.llm = ChatOpenAI(model=model, temperature=temperature)
-        self.parser = StrOutputParser()
-        self.debug = debug
-
-        # 사고유형별 프롬프트 템플릿 미리 준비
-        self.templates = {
-            "fire": self._fire_template(),
-            "oil_spill": self._oil_template(),
-            "collision": self._collision_template(),
-            "crew_injury": self._injury_template(),
-        }
-
-    # --------------------------------------------------
-    # 1️⃣ 공용 인터페이스
-    # --------------------------------------------------
-    def generate_report(
-        self,
-        incident_data: Dict[str, Any],
-        rag_context: str = "",
-        incident_type: str = "generic",
-    ) -> str:
-        """
-        사고유형에 맞는 프롬프트 선택 후 LLM 실행
-        """
-        formatted_incident = self._format_incident_data(incident_data)
-        prompt_template = self._select_template(incident_type)
 
-        # 프롬프트 생성
-        prompt = prompt_template.format(
-            rag_context=rag_context,
-            incident_data=formatted_incident,
-        )
-
-        if self.debug:
-            print("🧾 [프롬프트 시작] ----------------------")
-            print(prompt[:1200])
-            print("... (이하 생략)")
-            print("-----------------------------------------")
-
-        # LLM 실행
-        response = self.llm.invoke(prompt)
-        return self.parser.parse(response)
-
-    # --------------------------------------------------
-    # 2️⃣ 템플릿 선택 로직
-    # --------------------------------------------------
-    def _select_template(self, incident_type: str) -> PromptTemplate:
-        key = incident_type.lower()
-        if key in self.templates:
-            return self.templates[key]
-        else:
-            return self._generic_template()
-
-    # --------------------------------------------------
-    # 3️⃣ 사고유형별 템플릿 정의
-    # --------------------------------------------------
-    def _fire_template(self) -> PromptTemplate:
-        return PromptTemplate.from_template(
-            """
+# --------------------------------------------------
+# 사고유형별 템플릿 정의
+# - 모듈 로드 시 한 번만 PromptTemplate로 컴파일해서 모든 ReportChain 인스턴스가 공유
+# - 고정 부분(지시문 + 보고서 형식)을 앞에, 매번 바뀌는 {rag_context}/{incident_data}를 맨 뒤에 둔다
+#   → OpenAI 자동 프롬프트 캐싱(vLLM prefix caching)이 같은 사고유형의 접두 부분을 재사용
+# --------------------------------------------------
+_FIRE_TEMPLATE = """
 당신은 선박 보험 전문가입니다. 아래 [컨텍스트]를 근거로 선박 화재사고 보험 청구 보고서를 작성하세요.
 모르면 "근거 부족"이라고 명시하세요.
 
-[컨텍스트]
-{rag_context}
-
-[사고 정보]
-{incident_data}
-
+[보고서 형식]
 # 선박 화재사고 보험 청구 보고서
 
 ## 1. 사고 개요
@@ -104,21 +36,19 @@ class ReportChain:
 - 손해액, 공제액, 면책사유 여부
 ## 6. 결론 및 권고사항
 (마지막에 참고 문서 출처 요약)
-"""
-        )
-
-    def _oil_template(self) -> PromptTemplate:
-        return PromptTemplate.from_template(
-            """
-당신은 해양오염 사고 처리 전문가입니다.
-아래 [컨텍스트]를 기반으로 유류유출 사고의 보험 청구 보고서를 작성하세요.
 
 [컨텍스트]
 {rag_context}
 
 [사고 정보]
 {incident_data}
+"""
 
+_OIL_SPILL_TEMPLATE = """
+당신은 해양오염 사고 처리 전문가입니다.
+아래 [컨텍스트]를 기반으로 유류유출 사고의 보험 청구 보고서를 작성하세요.
+
+[보고서 형식]
 # 유류유출 사고 보험 청구 보고서
 
 ## 1. 사고 개요
@@ -133,20 +63,18 @@ class ReportChain:
 - 복구비, 방제비, 피해보상항목
 ## 6. 결론 및 권고사항
 (참고 문서 출처 포함)
-"""
-        )
-
-    def _collision_template(self) -> PromptTemplate:
-        return PromptTemplate.from_template(
-            """
-당신은 해사안전 전문가입니다. 아래 [컨텍스트]를 참조하여 선박 충돌사고 보험 보고서를 작성하세요.
 
 [컨텍스트]
 {rag_context}
 
 [사고 정보]
 {incident_data}
+"""
 
+_COLLISION_TEMPLATE = """
+당신은 해사안전 전문가입니다. 아래 [컨텍스트]를 참조하여 선박 충돌사고 보험 보고서를 작성하세요.
+
+[보고서 형식]
 # 선박 충돌사고 보험 청구 보고서
 
 ## 1. 사고 개요
@@ -160,21 +88,19 @@ class ReportChain:
 ## 5. 보험금 산정 근거
 - 수리비, 정박손실비용 등
 ## 6. 결론 및 향후 예방조치
-"""
-        )
-
-    def _injury_template(self) -> PromptTemplate:
-        return PromptTemplate.from_template(
-            """
-당신은 선원 재해 보상 전문 심사관입니다.
-아래 [컨텍스트]를 바탕으로 선원 부상사고 보험 청구 보고서를 작성하세요.
 
 [컨텍스트]
 {rag_context}
 
 [사고 정보]
 {incident_data}
+"""
 
+_CREW_INJURY_TEMPLATE = """
+당신은 선원 재해 보상 전문 심사관입니다.
+아래 [컨텍스트]를 바탕으로 선원 부상사고 보험 청구 보고서를 작성하세요.
+
+[보고서 형식]
 # 선원 부상사고 보험 청구 보고서
 
 ## 1. 사고 개요
@@ -188,20 +114,18 @@ class ReportChain:
 ## 5. 보험금 산정 근거
 - 치료비, 휴업급여, 장해급여 산정
 ## 6. 결론 및 권고사항
-"""
-        )
-
-    def _generic_template(self) -> PromptTemplate:
-        return PromptTemplate.from_template(
-            """
-아래 [컨텍스트]와 [사고 정보]를 바탕으로 일반 보험 청구 보고서를 작성하세요.
 
 [컨텍스트]
 {rag_context}
 
 [사고 정보]
 {incident_data}
+"""
 
+_GENERIC_TEMPLATE = """
+아래 [컨텍스트]와 [사고 정보]를 바탕으로 일반 보험 청구 보고서를 작성하세요.
+
+[보고서 형식]
 # 일반 보험 청구 보고서
 
 ## 1. 사고 개요
@@ -210,18 +134,105 @@ class ReportChain:
 ## 4. 법령 및 약관 근거
 ## 5. 보험금 산정 근거
 ## 6. 결론
+
+[컨텍스트]
+{rag_context}
+
+[사고 정보]
+{incident_data}
 """
+
+_TEMPLATES: Dict[str, PromptTemplate] = {
+    "fire": PromptTemplate.from_template(_FIRE_TEMPLATE),
+    "oil_spill": PromptTemplate.from_template(_OIL_SPILL_TEMPLATE),
+    "collision": PromptTemplate.from_template(_COLLISION_TEMPLATE),
+    "crew_injury": PromptTemplate.from_template(_CREW_INJURY_TEMPLATE),
+}
+_GENERIC = PromptTemplate.from_template(_GENERIC_TEMPLATE)
+
+# 사고 데이터 출력 순서 (IncidentReportRequest 필드 순, 그 외 키는 뒤에 입력 순서대로)
+_INCIDENT_FIELDS = ("incident_type", "description", "location", "report_type", "language")
+
+
+class ReportChain:
+    """
+    사고유형별 보험 청구 보고서 생성용 LangChain 체인
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.1,
+        debug: bool = False,
+    ):
+        self.llm = get_llm(model, temperature)  # (model, temperature)별 공용 인스턴스
+        self.debug = debug
+
+        # 사고유형별 프롬프트 템플릿 (모듈 레벨에서 미리 컴파일된 것 공유)
+        self.templates = _TEMPLATES
+
+    # --------------------------------------------------
+    # 1️⃣ 공용 인터페이스
+    # --------------------------------------------------
+    def generate_report(
+        self,
+        incident_data: Dict[str, Any],
+        rag_context: str = "",
+        incident_type: str = "generic",
+    ) -> str:
+        """
+        사고유형에 맞는 프롬프트 선택 후 LLM 실행
+        """
+        prompt = self._build_prompt(incident_data, rag_context, incident_type)
+
+        # LLM 실행 - AIMessage.content를 바로 꺼냄 (OutputParser 경유 불필요)
+        return self.llm.invoke(prompt).content
+
+    def stream(
+        self,
+        incident_data: Dict[str, Any],
+        rag_context: str = "",
+        incident_type: str = "generic",
+    ) -> Iterator[str]:
+        """
+        generate_report의 스트리밍 버전 - 보고서 텍스트 조각을 생성되는 대로 yield
+        """
+        prompt = self._build_prompt(incident_data, rag_context, incident_type)
+        for chunk in self.llm.stream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+    def _build_prompt(self, incident_data: Dict[str, Any], rag_context: str, incident_type: str) -> str:
+        formatted_incident = self._format_incident_data(incident_data)
+        prompt_template = self._select_template(incident_type)
+
+        # 프롬프트 생성
+        prompt = prompt_template.format(
+            rag_context=rag_context,
+            incident_data=formatted_incident,
         )
 
+        if self.debug:
+            print("🧾 [프롬프트 시작] ----------------------")
+            print(prompt[:1200])
+            print("... (이하 생략)")
+            print("-----------------------------------------")
+        return prompt
+
+    # --------------------------------------------------
+    # 2️⃣ 템플릿 선택 로직
+    # --------------------------------------------------
+    def _select_template(self, incident_type: str) -> PromptTemplate:
+        return self.templates.get(incident_type.lower(), _GENERIC)
+
     # --------------------------------------------------
-    # 4️⃣ 데이터 포맷팅
+    # 3️⃣ 데이터 포맷팅
     # --------------------------------------------------
     def _format_incident_data(self, data: Dict[str, Any]) -> str:
         """
         JSON 사고데이터를 사람이 읽기 쉬운 라인 포맷으로 변환
+        - 필드 순서를 고정하고, 제너레이터 하나로 바로 join
         """
-        lines = []
-        for key, val in data.items():
-            if val is not None and val != "":
-                lines.append(f"- {key}: {val}")
-        return "\n".join(lines) if lines else "(제공된 데이터 없음)"
+        keys = _INCIDENT_FIELDS + tuple(k for k in data if k not in _INCIDENT_FIELDS)
+        text = "\n".join(f"- {k}: {data[k]}" for k in keys if data.get(k) not in (None, ""))
+        return text or "(제공된 데이터 없음)"
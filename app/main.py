@@ -3,10 +3,16 @@ main.py
 - FastAPI 애플리케이션 실행 루트
 - 라우터 등록 (ingest, reports)
 - CORS, 환경변수 설정
+- 기본 응답 클래스: ORJSONResponse (orjson 직렬화)
+
+실행:
+    uvicorn app.main:app --loop uvloop --http httptools
+    (uvloop/httptools 미설치 시 --loop/--http 옵션 없이 기본 asyncio 루프로 실행)
 """
 
 import os
 from fastapi import FastAPI # 이거로 앱 인스턴스 생성 
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -20,18 +26,23 @@ load_dotenv()
 app = FastAPI(
     title="Marine Insurance Report Generator",
     description="LangChain 기반 해양 보험 청구 보고서 자동 생성 시스템",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,  # 표준 json 대신 orjson으로 응답 직렬화
 )
 
 # -------------------------------------------------------------
 # CORS 설정 (프론트엔드, Swagger, 외부 접근 허용)
 # -------------------------------------------------------------
-origins = os.getenv("CORS_ORIGINS", "*").split(",")  # 환경변수에서 CORS_ORIGINS 지정 가능
+# - 시작 시 한 번만 파싱해서 frozenset으로 보관 → 요청마다 origin 확인이 O(1) 해시 조회
+# - "*"(전체 허용)와 credentials는 함께 쓸 수 없으므로(CORS 규격) 와일드카드면 credentials 끔
+origins = frozenset(
+    o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()
+)  # 환경변수에서 CORS_ORIGINS 지정 가능
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
-    allow_credentials=True,
+    allow_credentials="*" not in origins,
     allow_methods=["*"],
     allow_headers=["*"],
 )
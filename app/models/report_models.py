@@ -5,8 +5,11 @@ report_models.py
 - 자유 질문 QA / 사고데이터 기반 보험 보고서 / 태스크 응답
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional, TypedDict
+
+# 요청/응답 모델은 만든 뒤 수정하지 않음 → frozen (속성 대입 검사/변경 추적 없음, 해시 가능)
+_FROZEN = ConfigDict(frozen=True)
 
 
 # ------------------------------------------------------------
@@ -16,6 +19,8 @@ class ReportGenerationRequest(BaseModel):
     """
     자유 질문을 LangChain + OpenAI 모델을 통해 분석/보고서 생성하는 요청 모델.
     """
+    model_config = _FROZEN
+
     question: str = Field(..., description="사용자 질문 또는 보고서 주제")
     collection: Optional[str] = Field(default="default", description="Chroma 벡터스토어 컬렉션명")
     top_k: Optional[int] = Field(default=4, description="검색할 상위 문서 수")
@@ -27,15 +32,14 @@ class ReportResponse(BaseModel):
     """
     LangChain(OpenAI LLM)으로부터 생성된 답변 응답.
     """
+    model_config = _FROZEN
+
     answer: str = Field(..., description="OpenAI 모델의 최종 응답 텍스트")
 
 
 # ------------------------------------------------------------
 # 2️.  사건 데이터 기반 해양 보험 보고서 생성 요청 -> 핵심 
 # ------------------------------------------------------------
-from pydantic import BaseModel, Field
-from typing import Optional
-
 class IncidentReportRequest(BaseModel):
     """
     해양 사고 데이터를 기반으로 보고서를 생성하는 요청 모델.
@@ -43,6 +47,8 @@ class IncidentReportRequest(BaseModel):
     내부적으로 RAGChain + ReportChain을 사용하여
     보험약관 및 법령 기반 보고서를 생성한다.
     """
+    model_config = _FROZEN
+
     incident_type: str = Field(..., description="사고 유형 (예: fire, oil_spill, collision, crew_injury 등)")
     description: str = Field(..., description="사고 설명 또는 세부 내용")
     location: str = Field(..., description="사고 발생 위치")
@@ -52,12 +58,26 @@ class IncidentReportRequest(BaseModel):
     # LangChain/RAG 설정
     use_rag: bool = Field(default=True, description="RAG 컨텍스트 사용 여부")
     collection: Optional[str] = Field(default="default", description="RAG 벡터스토어 컬렉션명")
+    collections: Optional[List[str]] = Field(default=None, description="함께 검색할 컬렉션 목록 (예: 법령, 약관, 판례). 지정 시 collection 대신 사용")
     top_k: Optional[int] = Field(default=5, description="RAG 검색 문서 수")
     model: Optional[str] = Field(default="gpt-4o-mini", description="사용할 OpenAI 모델명")
     title: Optional[str] = Field(default="해양 보험 청구 보고서", description="PDF 제목")
 
 
 
+class IncidentData(TypedDict, total=False):
+    """
+    서비스/체인으로 넘기는 사고 데이터 (IncidentReportRequest에서 추려낸 값)
+    - 서비스 내부 전달용이라 검증 없이 일반 dict로 다룸 (arq 작업 인자로도 그대로 직렬화)
+    """
+    incident_type: str
+    description: str
+    location: str
+    report_type: Optional[str]
+    language: Optional[str]
+    title: str
+
+
 # ------------------------------------------------------------
 # 3️. 비동기 태스크 응답
 # ------------------------------------------------------------
@@ -65,19 +85,31 @@ class ReportTaskResponse(BaseModel):
     """
     백그라운드에서 실행된 보고서 생성 태스크의 식별자 응답.
     """
+    model_config = _FROZEN
+
     task_id: str = Field(..., description="비동기 보고서 생성 태스크 ID (UUID)")
     message: str = Field(default="보고서 생성이 시작되었습니다.", description="현재 상태 메시지")
 
 
+# 응답 직렬화 전용 (msgspec 설치 시) - 검증 없이 바로 JSON 인코딩, 스키마 문서는 위 Pydantic 모델 사용
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if msgspec is not None:
+    class ReportTaskStruct(msgspec.Struct):
+        task_id: str
+        message: str = "보고서 생성이 시작되었습니다."
+else:
+    ReportTaskStruct = None
+
+
 # ------------------------------------------------------------
-# 4️. (선택) 사고유형 Enum 정의 (확장용)
+# 4️. (선택) 사고유형 정의 (확장용)
 # ------------------------------------------------------------
-class IncidentType(str):
-    """
-    사고 유형 (Enum처럼 문자열로 관리)
-    """
-    FIRE = "fire"
-    OIL_SPILL = "oil_spill"
-    COLLISION = "collision"
-    CREW_INJURY = "crew_injury"
-    GENERIC = "generic"
+IncidentType = Literal["fire", "oil_spill", "collision", "crew_injury", "generic"]
+"""
+사고 유형 (템플릿/검색 힌트가 있는 값)
+- 요청 필드(incident_type)는 대소문자·신규 유형도 받아야 해서 str로 두고, 서비스에서 소문자로 맞춘 뒤 없는 유형은 generic 처리
+"""
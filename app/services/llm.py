@@ -0,0 +1,50 @@
+
+"""
+공용 LLM 클라이언트
+- (model, temperature) 조합별 ChatOpenAI 인스턴스를 하나만 만들어 체인/요청 간에 공유
+- 모든 인스턴스가 같은 httpx 커넥션 풀을 써서 반복 호출 시 TCP/TLS 세션을 재사용
+
+사용 예시:
+    llm = get_llm("gpt-4o-mini", 0.2)
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+# 커넥션 풀 설정 (동기/비동기 클라이언트 공용)
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+
+@lru_cache(maxsize=1)
+def _http_client() -> httpx.Client:
+    return httpx.Client(limits=_HTTP_LIMITS)
+
+
+@lru_cache(maxsize=1)
+def _http_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=_HTTP_LIMITS)
+
+
+@lru_cache(maxsize=8)
+def get_llm(model: str = "gpt-4o-mini", temperature: float = 0.2) -> "ChatOpenAI":
+    """
+    (model, temperature)별 ChatOpenAI 싱글톤 반환
+    - langchain_openai는 import 비용이 커서 처음 호출할 때 import
+    """
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=_http_client(),
+        http_async_client=_http_async_client(),
+    )
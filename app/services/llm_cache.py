@@ -0,0 +1,120 @@
+
+"""
+SemanticCache - 의미 기반 LLM 응답 캐시
+- 질문을 임베딩해서 전용 Chroma 컬렉션(llmcache_{collection})에 답변과 함께 저장
+- 다음 질문이 들어오면 가장 가까운 이전 질문을 찾아, 코사인 거리가 임계값 이하면 저장된 답변을 그대로 반환
+  → 표현만 조금 다른 반복 질문은 OpenAI 호출 없이 바로 응답
+- 답변 근거가 된 컬렉션에 문서가 새로 수집되면 해당 답변들은 삭제 (invalidate_cache, 수집 시 VectorStoreService가 호출)
+
+환경변수:
+- LLM_CACHE_ENABLED      : "0"이면 캐시 비활성화 (기본: 1)
+- LLM_CACHE_DISTANCE     : 캐시 히트로 판정할 최대 코사인 거리 (기본: 0.1)
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from app.services.vectorstore import VectorStoreService
+
+
+# 캐시 전용 Chroma 컬렉션 이름 prefix (문서 컬렉션 목록에서는 제외)
+CACHE_PREFIX = "llmcache_"
+
+
+def _source_key(collection: str) -> str:
+    # 답변 근거 컬렉션 표시용 메타데이터 키 (Chroma 메타데이터는 리스트를 못 넣으므로 컬렉션별 bool 키)
+    return f"src:{collection}"
+
+
+def invalidate_cache(client, collection: str):
+    """
+    collection을 검색해서 만든 캐시 답변을 모든 캐시 컬렉션에서 삭제
+    - client: chromadb 클라이언트 (VectorStoreService.client)
+    """
+    for c in client.list_collections():
+        name = getattr(c, "name", c)
+        if not name.startswith(CACHE_PREFIX):
+            continue
+        store = client.get_collection(name)
+        store.delete(where={_source_key(collection): True})
+        if name == f"{CACHE_PREFIX}{collection}":
+            store.delete(where={"collection": collection})  # 근거 표시 없이 저장된 이전 항목
+
+
+def cache_enabled() -> bool:
+    """
+    LLM_CACHE_ENABLED 환경변수로 캐시 사용 여부 확인
+    """
+    return os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+
+class SemanticCache:
+    """
+    질문 임베딩 → [Chroma: llmcache_{collection}] → 유사 질문의 답변 재사용
+    """
+
+    def __init__(
+        self,
+        vs: "VectorStoreService",
+        collection: str,
+        distance_threshold: Optional[float] = None,
+        sources: Optional[List[str]] = None,
+    ):
+        """
+        sources: 답변을 만들 때 검색하는 컬렉션 목록 (없으면 [collection]) - 이 중 하나라도 수집되면 무효화
+        """
+        self.vs = vs
+        self.collection = collection
+        self.sources = sources or [collection]
+        self.distance_threshold = (
+            distance_threshold
+            if distance_threshold is not None
+            else float(os.getenv("LLM_CACHE_DISTANCE", "0.1"))
+        )
+
+        # 문서 컬렉션과 섞이지 않도록 캐시 전용 컬렉션 사용 (거리 기준은 코사인)
+        from langchain_community.vectorstores import Chroma  # import 비용이 커서 캐시를 처음 만들 때
+
+        self.cache_store = Chroma(
+            client=vs.client,
+            collection_name=f"{CACHE_PREFIX}{collection}",
+            embedding_function=vs.embeddings,
+            persist_directory=vs.persist_dir,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+
+    def check(self, prompt: str, scope: str = "") -> Optional[str]:
+        """
+        가장 가까운 이전 질문이 임계값 안이면 저장된 답변 반환, 아니면 None
+        - scope: 모델/검색 설정 등 답변에 영향을 주는 값 (같은 scope 안에서만 재사용)
+        """
+        # 질문 임베딩은 VectorStoreService 캐시를 통해 이후 문서 검색/저장과 공유
+        hits = self.cache_store.similarity_search_by_vector_with_relevance_scores(
+            self.vs.embed_query(prompt), k=1, filter={"scope": scope}
+        )
+        if not hits:
+            return None
+        doc, distance = hits[0]
+        if distance > self.distance_threshold:
+            return None
+        return doc.metadata.get("response")
+
+    def store(self, prompt: str, response: str, scope: str = ""):
+        """
+        질문(임베딩 대상) + 답변(메타데이터)을 캐시 컬렉션에 저장
+        """
+        self.cache_store._collection.add(  # 내부 핸들 접근 (커뮤니티 드라이버 관례)
+            ids=[str(uuid.uuid4())],
+            embeddings=[self.vs.embed_query(prompt)],
+            documents=[prompt],
+            metadatas=[{
+                "collection": self.collection,
+                "scope": scope,
+                "response": response,
+                **{_source_key(c): True for c in self.sources},
+            }],
+        )
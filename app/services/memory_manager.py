@@ -1,87 +1,212 @@
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import messages_from_dict, messages_to_dict #JSON 직렬화/복원할 수 있게 도와주는 함수들
+from collections import OrderedDict, deque
 from typing import Dict, Optional 
-import uuid
+import os
+import threading
+import time
+
+# 세션 보관 한도 (환경변수로 조정 가능)
+# - MEMORY_MAX_SESSIONS: 최대 세션 수, 넘으면 가장 오래 안 쓴 세션부터 제거 (기본 10000)
+# - MEMORY_SESSION_TTL : 마지막 사용 후 이 시간(초)이 지나면 만료 (기본 3600)
+MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+SESSION_TTL = float(os.getenv("MEMORY_SESSION_TTL", "3600"))
+
+# 새 세션 ID 발급용 난수 버퍼 - os.urandom을 256개분씩 한 번에 읽어서 세션마다 커널 호출하지 않음
+_ID_BATCH = 256
+_id_buf: deque = deque()
+_id_lock = threading.Lock()
+
+
+def _new_session_id() -> str:
+    """
+    UUID v4 형식(버전/variant 비트 설정)의 32자리 hex 세션 ID
+    """
+    with _id_lock:
+        if not _id_buf:
+            raw = bytearray(os.urandom(16 * _ID_BATCH))
+            for i in range(0, len(raw), 16):
+                raw[i + 6] = (raw[i + 6] & 0x0F) | 0x40  # version 4
+                raw[i + 8] = (raw[i + 8] & 0x3F) | 0x80  # RFC 4122 variant
+                _id_buf.append(raw[i:i + 16].hex())
+        return _id_buf.popleft()
+
+
+# history_text 줄 머리말
+_USER = "사용자: "
+_AI = "AI: "
+
+# 세션별로 유지할 대화 턴 수 (1턴 = 사용자 + AI 메시지 2개 → 최근 메시지 20개)
+HISTORY_TURNS = 10
 
 class MemoryManager:
     """
     LangChain 기반 멀티 세션 대화 메모리 관리자.
-    각 세션별로 ConversationBufferMemory 인스턴스를 보관한다.
+    각 세션별로 ConversationBufferWindowMemory 인스턴스를 보관한다.
+    - 세션별 메시지는 최근 HISTORY_TURNS턴만 남기고 잘라냄 (세션당 메모리 O(1))
+    - 최근 사용 순(LRU)으로 최대 max_sessions개, 마지막 사용 후 ttl초까지만 유지
     """
 
-    def __init__(self):
-        # 세션ID별 메모리 저장소 (딕셔너리)
-        self.sessions: Dict[str, ConversationBufferMemory] = {}
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        # 세션ID별 메모리 저장소 (오래 안 쓴 순 → 최근 사용 순)
+        self.sessions: "OrderedDict[str, ConversationBufferWindowMemory]" = OrderedDict()
         """
         { -> 이렇게 저장됨 
-            "session_1": <ConversationBufferMemory>,
-            "session_2": <ConversationBufferMemory>
+            "session_1": <ConversationBufferWindowMemory>,
+            "session_2": <ConversationBufferWindowMemory>
         }
 
         """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._last_used: Dict[str, float] = {}
+        # history_text용: 세션별 포맷된 줄("사용자: ..."/"AI: ...")과 join 결과 캐시 (대화가 추가되면 무효화)
+        self._lines: Dict[str, deque] = {}
+        self._history: Dict[str, str] = {}
+        self._lock = threading.Lock()  # 요청 핸들러와 백그라운드 태스크(스레드)가 동시에 접근
+
+    def _expire(self, now: float):
+        """
+        만료된 세션 제거 - 앞쪽이 가장 오래 안 쓴 세션이므로 만료되지 않은 세션을 만나면 중단
+        """
+        while self.sessions:
+            sid = next(iter(self.sessions))
+            if now - self._last_used[sid] < self.ttl:
+                break
+            self._drop(sid)
+
+    def _drop(self, sid: str):
+        # 세션과 부속 캐시 제거 (lock 안에서 호출)
+        del self.sessions[sid]
+        del self._last_used[sid]
+        self._lines.pop(sid, None)
+        self._history.pop(sid, None)
+
+    def _put(self, sid: str, memory: ConversationBufferWindowMemory):
+        with self._lock:
+            now = time.monotonic()
+            self.sessions[sid] = memory
+            self.sessions.move_to_end(sid)
+            self._last_used[sid] = now
+            self._lines[sid] = deque(
+                [(_USER if m.type == "human" else _AI) + m.content for m in memory.chat_memory.messages],
+                maxlen=2 * memory.k,
+            )
+            self._history.pop(sid, None)
+            self._expire(now)
+            while len(self.sessions) > self.max_sessions:
+                self._drop(next(iter(self.sessions)))
+
+    def _get(self, sid: str) -> Optional[ConversationBufferWindowMemory]:
+        """
+        세션 메모리 조회 (없거나 만료됐으면 None) + 최근 사용으로 갱신
+        """
+        with self._lock:
+            memory = self.sessions.get(sid)
+            if memory is None:
+                return None
+            now = time.monotonic()
+            if now - self._last_used[sid] >= self.ttl:
+                self._drop(sid)
+                return None
+            self.sessions.move_to_end(sid)
+            self._last_used[sid] = now
+            return memory
 
     def ensure(self, session_id: Optional[str]) -> str: # '-> str' 리턴 타입 힌트구나.
         """
         세션ID가 주어지지 않으면 새로 생성하고, 해당 세션용 메모리를 준비한다.
         """
-        sid = session_id or str(uuid.uuid4())
-        if sid not in self.sessions:
+        sid = session_id or _new_session_id()
+        self._memory(sid)
+        return sid
+
+    def _memory(self, sid: str) -> ConversationBufferWindowMemory:
+        """
+        세션 메모리 반환 (없거나 만료됐으면 새로 생성)
+        """
+        memory = self._get(sid)
+        if memory is None:
             # 새 세션 생성 시 LangChain 메모리 초기화
-            self.sessions[sid] = ConversationBufferMemory(
+            memory = ConversationBufferWindowMemory(
                 memory_key="chat_history",
-                return_messages=True
+                return_messages=True,
+                k=HISTORY_TURNS,
             )
-        return sid
+            self._put(sid, memory)
+        return memory
+
+    def _append_line(self, sid: str, line: str):
+        with self._lock:
+            lines = self._lines.get(sid)
+            if lines is not None:
+                lines.append(line)  # maxlen이라 윈도우 밖 줄은 자동으로 빠짐
+                self._history.pop(sid, None)
+
+    @staticmethod
+    def _trim(memory: ConversationBufferWindowMemory):
+        # 윈도우 메모리도 chat_memory.messages 자체는 계속 쌓이므로 윈도우 밖 메시지는 버림
+        messages = memory.chat_memory.messages
+        del messages[:-2 * memory.k]
 
     def add_user(self, sid: str, text: str):
         """
         특정 세션의 메모리에 사용자 메시지를 추가한다.
         """
-        if sid not in self.sessions:
-            self.ensure(sid)
-        self.sessions[sid].chat_memory.add_user_message(text)
+        memory = self._memory(sid)
+        memory.chat_memory.add_user_message(text)
+        self._trim(memory)
+        self._append_line(sid, _USER + text)
 
     def add_ai(self, sid: str, text: str):
         """
         특정 세션의 메모리에 AI 메시지를 추가한다.
         """
-        if sid not in self.sessions:
-            self.ensure(sid)
-        self.sessions[sid].chat_memory.add_ai_message(text)
+        memory = self._memory(sid)
+        memory.chat_memory.add_ai_message(text)
+        self._trim(memory)
+        self._append_line(sid, _AI + text)
 
     def history_text(self, sid: str) -> str:
         """
         특정 세션의 대화 히스토리를 문자열로 반환한다.
-        LangChain 내부 메시지 리스트를 사람이 읽기 쉽게 포맷팅.
+        메시지 추가 시 미리 포맷해 둔 줄을 join하고, 다음 대화 추가 전까지 결과를 재사용.
         """
-        if sid not in self.sessions:
+        if self._get(sid) is None:
             return ""
-        messages = self.sessions[sid].chat_memory.messages
-        formatted = []
-        for m in messages[-20:]:  # 최근 20턴만 유지
-            role = "사용자" if m.type == "human" else "AI"
-            formatted.append(f"{role}: {m.content}")
-        return "\n".join(formatted)
+        with self._lock:
+            text = self._history.get(sid)
+            if text is None:
+                lines = self._lines.get(sid)
+                if lines is None:  # 조회 직후 만료/삭제된 경우
+                    return ""
+                # 마지막 대화 추가 이후 처음 호출될 때만 join
+                text = self._history[sid] = "\n".join(lines)
+            return text
 
     def export_session(self, sid: str):
         """
         (선택) 세션 기록을 JSON 직렬화된 딕셔너리 형태로 내보내기.
         FastAPI에서 파일로 저장하거나 복원할 때 유용.
         """
-        if sid not in self.sessions:
+        memory = self._get(sid)
+        if memory is None:
             return []
-        return messages_to_dict(self.sessions[sid].chat_memory.messages)
+        return messages_to_dict(memory.chat_memory.messages)
 
     def import_session(self, sid: str, data):
         """
         (선택) 외부에서 JSON 형태로 불러온 대화 기록을 복원.
         """
-        self.sessions[sid] = ConversationBufferMemory(return_messages=True)
-        self.sessions[sid].chat_memory.messages = messages_from_dict(data)
+        memory = ConversationBufferWindowMemory(memory_key="chat_history", return_messages=True, k=HISTORY_TURNS)
+        memory.chat_memory.messages = messages_from_dict(data)
+        self._trim(memory)  # 윈도우 크기에 맞춰 최근 메시지만 복원
+        self._put(sid, memory)
 
     def clear(self, sid: str):
         """
         특정 세션 메모리 초기화.
         """
-        if sid in self.sessions:
-            del self.sessions[sid]
+        with self._lock:
+            if sid in self.sessions:
+                self._drop(sid)
@@ -0,0 +1,272 @@
+
+"""
+Int8VectorIndex - 컬렉션별 int8 양자화 벡터 사이드카 인덱스
+- Chroma는 문서/메타데이터 원본 저장소로 그대로 두고, 검색용 벡터만 int8로 따로 보관
+- 벡터를 정규화한 뒤 컬렉션 단위 scale로 int8 변환: (v * 127 / scale).astype(np.int8)
+- 검색은 int8 × int8 내적(np.einsum, int32 누적) → FP32 대비 메모리/대역폭 1/4
+
+저장 위치: {persist_dir}/{collection}.int8.npz  (ids, codes, scale)
+
+재정렬(rerank) - 정규화한 원본 벡터의 FP16 사본을 {인덱스 경로}.fp16.npy로 함께 저장
+- search(vector, k, oversample=n)이면 양자화 인덱스에서 k*n개 후보 → FP16 내적으로 다시 정렬해서 상위 k개
+- 검색 시에는 memmap으로 후보 행만 읽음 (전체를 메모리에 올리지 않음), 새 행은 save 때 이어 붙여 기록
+- 사본 없이 만들어진 기존 인덱스는 재정렬 없이 동작
+
+UsearchVectorIndex - 같은 인터페이스(add/search/__len__)의 usearch HNSW 인덱스 (usearch 설치 시)
+- dtype "bf16"(메모리 1/2, recall 손실 거의 없음) 또는 "i8"(1/4)로 벡터 저장, 거리 함수는 cos
+- 저장 위치: {persist_dir}/{collection}.{dtype}.usearch  (+ .ids.npy: usearch 정수 키 → Chroma 문자열 id)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# FP16 사본 저장 시 기존 memmap에서 한 번에 복사할 행 수 (파일 전체를 메모리에 올리지 않도록)
+_COPY_ROWS = 65_536
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+class _RawVectors:
+    """
+    정규화 벡터의 FP16 사본 (재정렬용) - 행 번호 = 인덱스 내부 순번
+    - 디스크에 저장된 행은 memmap(base), 이후 추가된 행은 배치 리스트(pending)로 들고 있다가 save 때 한 번에 기록
+      → 배치마다 전체 배열을 복사하지 않고, 기존 파일을 메모리에 통째로 올리지도 않음
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.base: Optional[np.ndarray] = None  # (N0, D) float16 memmap
+        self._pending: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.base = np.load(path, mmap_mode="r")
+
+    def _n_base(self) -> int:
+        return 0 if self.base is None else len(self.base)
+
+    def __len__(self) -> int:
+        return self._n_base() + sum(len(p) for p in self._pending)
+
+    def add(self, x: np.ndarray):
+        with self._lock:
+            self._pending.append(x.astype(np.float16))
+
+    def _tail(self) -> Optional[np.ndarray]:
+        # 검색 직전 추가분을 하나로 합쳐둠 (추가 없이 검색만 반복되면 다시 합치지 않음)
+        if len(self._pending) > 1:
+            self._pending = [np.concatenate(self._pending)]
+        return self._pending[0] if self._pending else None
+
+    def save(self):
+        """
+        base + 추가분을 새 파일에 순서대로 기록 → os.replace (기존 파일을 memmap으로 읽는 중이어도 안전)
+        """
+        with self._lock:
+            tail = self._tail()
+            if tail is None:
+                return
+            n0 = self._n_base()
+            tmp = f"{self.path}.tmp.npy"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float16, shape=(n0 + len(tail), tail.shape[1]))
+            for start in range(0, n0, _COPY_ROWS):
+                out[start : start + _COPY_ROWS] = self.base[start : start + _COPY_ROWS]
+            out[n0:] = tail
+            out.flush()
+            del out
+            os.replace(tmp, self.path)
+            self.base = np.load(self.path, mmap_mode="r")
+            self._pending = []
+
+    def rerank(self, vector: Sequence[float], positions: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """
+        후보 행들과 질의의 FP16 내적(FP32 누적)으로 다시 정렬 → 상위 k개 (행 번호, 코사인 유사도)
+        """
+        with self._lock:
+            base, tail, n0 = self.base, self._tail(), self._n_base()
+        positions = np.asarray(positions, dtype=np.int64)
+        in_base = positions < n0
+        dim = base.shape[1] if base is not None else tail.shape[1]
+        rows = np.empty((len(positions), dim), dtype=np.float32)
+        if in_base.any():
+            rows[in_base] = base[positions[in_base]]
+        if not in_base.all():
+            rows[~in_base] = tail[positions[~in_base] - n0]
+        q = _normalize(np.asarray(vector, dtype=np.float32))
+        scores = rows @ q
+        top = np.argsort(-scores)[:k]
+        return [(int(positions[i]), float(scores[i])) for i in top]
+
+
+def _raw_vectors(index_path: str, n: int) -> Optional[_RawVectors]:
+    """
+    FP16 사본은 인덱스와 행 수가 맞을 때만 사용 (사본 없이 만들어진 기존 인덱스는 재정렬 생략)
+    """
+    raw = _RawVectors(f"{index_path}.fp16.npy")
+    return raw if len(raw) == n else None
+
+
+class Int8VectorIndex:
+    """
+    정규화 벡터 → [int8 양자화] → 내적(코사인 근사) 검색
+    """
+
+    def __init__(self, persist_dir: str, collection: str):
+        self.path = os.path.join(persist_dir, f"{collection}.int8.npz")
+        self.ids = np.empty(0, dtype=str)
+        self.codes: Optional[np.ndarray] = None  # (N, D) int8
+        self.scale: Optional[float] = None
+        self._lock = threading.Lock()
+        # add는 배치를 리스트에 쌓기만 하고, 검색/저장 직전에 한 번만 합침 (배치마다 전체 배열 복사 방지)
+        self._pending_codes: List[np.ndarray] = []
+        self._pending_ids: List[np.ndarray] = []
+        self._n = 0
+
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            self.ids = data["ids"]
+            self.codes = data["codes"]
+            self.scale = float(data["scale"])
+            self._n = len(self.codes)
+        self.raw = _raw_vectors(self.path, len(self))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _consolidate(self):
+        # self._lock 안에서 호출
+        if self._pending_codes:
+            existing = [] if self.codes is None else [self.codes]
+            self.codes = np.concatenate(existing + self._pending_codes)
+            self.ids = np.concatenate([self.ids] + self._pending_ids)
+            self._pending_codes, self._pending_ids = [], []
+
+    def _quantize(self, x: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(x * (127.0 / self.scale)), -127, 127).astype(np.int8)
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        FP32 벡터를 int8로 변환해서 추가 (디스크 저장은 save에서)
+        - scale은 첫 배치의 최대 절댓값으로 고정 (이후 배치는 clip)
+        """
+        if not ids:
+            return
+        x = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.scale is None:
+                self.scale = float(np.abs(x).max()) or 1.0
+            if self.raw is not None:
+                self.raw.add(x)  # 사본을 먼저 늘려둠 → 동시에 도는 검색의 후보 행이 항상 사본 범위 안
+            self._pending_codes.append(self._quantize(x))
+            self._pending_ids.append(np.asarray(ids, dtype=str))
+            self._n += len(ids)
+
+    def save(self):
+        """
+        현재 인덱스 전체를 디스크에 저장
+        """
+        with self._lock:
+            self._consolidate()
+            if self.codes is not None:
+                np.savez(self.path, ids=self.ids, codes=self.codes, scale=self.scale)
+            if self.raw is not None:
+                self.raw.save()
+
+    def search(self, vector: Sequence[float], k: int, oversample: int = 1) -> List[Tuple[str, float]]:
+        """
+        질의 벡터와 int8 내적이 큰 순서로 상위 k개 (id, 코사인 유사도 근사값) 반환
+        - 질의도 수집 때 저장한 컬렉션 scale로 양자화
+        - codes ≈ v * 127 / scale 이므로 cos ≈ dot * (scale / 127)^2
+        - oversample > 1이면 k*oversample개 후보를 FP16 사본으로 재정렬 (점수도 FP16 코사인)
+        """
+        if not len(self):
+            return []
+        with self._lock:
+            self._consolidate()
+            codes, ids = self.codes, self.ids
+        q = self._quantize(_normalize(np.asarray(vector, dtype=np.float32)))
+        scores = np.einsum("ij,j->i", codes, q, dtype=np.int32)
+        rerank = oversample > 1 and self.raw is not None
+        n = min(k * oversample if rerank else k, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        if rerank:
+            return [(str(ids[i]), sim) for i, sim in self.raw.rerank(vector, top, k)]
+        top = top[np.argsort(-scores[top])]
+        factor = (self.scale / 127.0) ** 2
+        return [(str(ids[i]), float(scores[i]) * factor) for i in top]
+
+
+class UsearchVectorIndex:
+    """
+    정규화 벡터 → [usearch HNSW, bf16/i8 저장] → 코사인 유사도 검색
+    """
+
+    def __init__(self, persist_dir: str, collection: str, dtype: str = "bf16"):
+        from usearch.index import Index  # usearch 백엔드를 쓸 때만 필요
+
+        base = os.path.join(persist_dir, f"{collection}.{dtype}.usearch")
+        self.path = base
+        self.ids_path = f"{base}.ids.npy"
+        self.dtype = dtype
+        self._Index = Index
+        self.index = None  # 첫 add 때 차원을 알고 생성
+        self.ids: List[str] = []  # 키 순번 → Chroma id (배치마다 배열을 다시 만들지 않도록 리스트)
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            self.index = Index.restore(self.path)
+            self.ids = np.load(self.ids_path).tolist()
+        self.raw = _raw_vectors(self.path, len(self))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        벡터 추가 (usearch 키 = 추가된 순번, 디스크 저장은 save에서)
+        """
+        if not ids:
+            return
+        x = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.index is None:
+                self.index = self._Index(ndim=x.shape[1], metric="cos", dtype=self.dtype)
+            keys = np.arange(len(self.ids), len(self.ids) + len(ids), dtype=np.uint64)
+            if self.raw is not None:
+                self.raw.add(_normalize(x))  # 사본을 먼저 늘려둠 (Int8VectorIndex.add와 같은 이유)
+            self.index.add(keys, x)
+            self.ids.extend(ids)
+
+    def save(self):
+        """
+        인덱스 + id 매핑을 디스크에 저장
+        """
+        with self._lock:
+            if self.index is not None:
+                self.index.save(self.path)
+                np.save(self.ids_path, np.asarray(self.ids, dtype=str))
+            if self.raw is not None:
+                self.raw.save()
+
+    def search(self, vector: Sequence[float], k: int, oversample: int = 1) -> List[Tuple[str, float]]:
+        """
+        상위 k개 (id, 코사인 유사도) 반환 - usearch cos 거리 = 1 - 유사도
+        - oversample > 1이면 k*oversample개 후보를 FP16 사본으로 재정렬
+        """
+        if not len(self):
+            return []
+        rerank = oversample > 1 and self.raw is not None
+        n = min(k * oversample if rerank else k, len(self))
+        matches = self.index.search(np.asarray(vector, dtype=np.float32), n)
+        if rerank:
+            positions = np.asarray(matches.keys, dtype=np.int64)
+            return [(self.ids[i], sim) for i, sim in self.raw.rerank(vector, positions, k)]
+        return [(self.ids[int(key)], 1.0 - float(dist)) for key, dist in zip(matches.keys, matches.distances)]
@@ -6,19 +6,141 @@ ReportService / InsuranceReportService
 
 환경변수:
 - REPORTS_DIR: PDF 저장 디렉터리 (기본: ./storage/reports)
+- REPORTS_S3_BUCKET: 설정 시 저장된 PDF를 오브젝트 스토리지에도 업로드 (app/services/report_store.py)
+- REPORT_PDF_PROCESSES: PDF 렌더링 전용 프로세스 수, 0이면 호출한 스레드에서 바로 렌더링 (기본: 2)
+- RAG_CONTEXT_CACHE_TTL: 같은 seed query의 RAG 컨텍스트를 재사용할 시간(초), 0이면 비활성화 (기본: 3600)
 """
 
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
 import os
-from typing import Optional, Tuple, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple, Dict
 
 from app.chains.rag_chain import RAGChain
 from app.chains.report_chain import ReportChain
+from app.models.report_models import IncidentData
 from app.services.memory_manager import MemoryManager  # (선택) QA 히스토리용
+from app.services.report_store import get_report_store
+from app.services.vectorstore import get_vectorstore_service
 from app.utils.pdf import save_report_pdf
 
 
+# 사고유형별 RAG 검색 힌트 (법령/약관을 더 잘 당겨오기 위한 키워드)
+_SEED_HINTS: Dict[str, str] = {
+    "fire": "선박 화재사고 처리 기준, 보험 약관 화재조항, 선박안전법 관련 조항",
+    "oil_spill": "유류유출 방제 기준, 해양환경관리법, MARPOL 협약, 보험 약관 오염조항",
+    "collision": "선박 충돌 관련 해사안전법, 국제충돌예방규칙 COLREGS, 보험 약관 충돌조항",
+    "crew_injury": "선원 재해 보상, 선원법, 산재보험 관련 규정, 보험 약관 인적사고 조항",
+    "generic": "해상보험 일반 약관, 선박사고 일반 규정",
+}
+
+
+# RAG 컨텍스트 캐시 (정확히 같은 검색 조건 + seed query → 이전 rag_ctx 재사용)
+# - 완전 일치만 검색/LLM 호출 없이 바로 반환
+# - 보고서용 RAG 체인은 SemanticCache를 쓰지 않음: seed의 대부분이 사고유형별 공통 힌트라서
+#   설명이 다른 사고끼리도 임베딩 거리가 가까워 다른 사고의 컨텍스트가 재사용될 수 있음
+_RAG_CTX_CACHE_SIZE = 1024
+_RAG_CTX_CACHE_TTL = float(os.getenv("RAG_CONTEXT_CACHE_TTL", "3600"))
+
+
+# PDF 렌더링(reportlab)은 순수 파이썬 CPU 작업 → 별도 프로세스로 넘겨 GIL을 API 이벤트 루프와 다투지 않게 함
+_PDF_PROCESSES = int(os.getenv("REPORT_PDF_PROCESSES", "2"))
+
+
+@lru_cache(maxsize=1)
+def _pdf_pool() -> ProcessPoolExecutor:
+    # spawn: 스레드(httpx 풀, 임베딩/검색 풀, flush 타이머)가 도는 프로세스를 fork하면 자식이 잠긴 락에서 멈출 수 있음
+    return ProcessPoolExecutor(max_workers=_PDF_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _render_pdf(path: str, title: str, question: str, answer: str):
+    """
+    save_report_pdf를 렌더링 프로세스 풀에서 실행하고 완료까지 대기 (풀 비활성화 시 바로 실행)
+    """
+    if _PDF_PROCESSES <= 0:
+        save_report_pdf(path, title=title, question=question, answer=answer)
+        return
+    _pdf_pool().submit(save_report_pdf, path, title=title, question=question, answer=answer).result()
+
+
+# 이미 만든 보고서 디렉터리 (서비스를 여러 번 생성해도 makedirs는 디렉터리당 한 번)
+_dirs_made: set = set()
+
+
+def _ensure_dir(path: str):
+    if path not in _dirs_made:
+        os.makedirs(path, exist_ok=True)
+        _dirs_made.add(path)
+
+
+class _SavedReports:
+    """
+    저장 완료된 task_id 집합 (최근 max_size개, LRU) - get_report_path 폴링 시 stat() 호출 생략
+    - 생성 시 reports_dir을 한 번 훑어서 기존 보고서로 채워둠
+    """
+
+    def __init__(self, reports_dir: str, max_size: int = 10_000):
+        self.max_size = max_size
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        with os.scandir(reports_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf"):
+                    self.add(entry.name[:-4])
+
+    def add(self, task_id: str):
+        with self._lock:
+            self._ids[task_id] = None
+            self._ids.move_to_end(task_id)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._ids
+
+
+@lru_cache(maxsize=None)
+def _saved_reports(reports_dir: str) -> _SavedReports:
+    """
+    보고서 디렉터리별 공용 _SavedReports - 두 서비스가 같은 REPORTS_DIR을 따로 scandir하지 않도록
+    """
+    return _SavedReports(reports_dir)
+
+
+# 체인 인스턴스 공유 - 설정 조합별로 한 번만 생성 (LLM/캐시 컬렉션 핸들/프롬프트 구성 비용 제거)
+# - 두 체인 모두 호출 간 상태가 없으므로 스레드/요청 간에 같은 인스턴스를 써도 됨
+@lru_cache(maxsize=64)
+def _rag_chain(
+    collection: str,
+    top_k: int,
+    model: str,
+    temperature: float,
+    collections: Optional[Tuple[str, ...]] = None,
+    use_cache: bool = True,
+) -> RAGChain:
+    return RAGChain(
+        collection=collection,
+        top_k=top_k,
+        model=model,
+        temperature=temperature,
+        collections=list(collections) if collections else None,
+        include_sources=True,
+        use_cache=use_cache,
+    )
+
+
+@lru_cache(maxsize=8)
+def _report_chain(model: str, temperature: float) -> ReportChain:
+    return ReportChain(model=model, temperature=temperature)
+
+
 # -----------------------------------------------------------
 # 핵심: 사건 데이터 기반 보험 보고서 생성
 # -----------------------------------------------------------
@@ -30,10 +152,13 @@ class InsuranceReportService:
 
     def __init__(self):
         self.reports_dir = os.getenv("REPORTS_DIR", "./storage/reports")
-        os.makedirs(self.reports_dir, exist_ok=True)
+        _ensure_dir(self.reports_dir)
+        self._saved = _saved_reports(self.reports_dir)
+        self._ctx_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key → (저장 시각, rag_ctx)
+        self._ctx_lock = threading.Lock()
 
     
-    def _build_seed_query(self, incident_data: Dict[str, Any], incident_type: str) -> str:
+    def _build_seed_query(self, incident_data: IncidentData, incident_type: str) -> str:
         """
         RAG 검색 시 사용할 seed query를 사고유형에 맞게 생성.
         - description/title이 있으면 우선 포함
@@ -45,18 +170,8 @@ class InsuranceReportService:
         ).strip()
 
 
-        itype = (incident_type or incident_data.get("incident_type", "generic")).lower()
-
-        if itype == "fire":
-            hint = "선박 화재사고 처리 기준, 보험 약관 화재조항, 선박안전법 관련 조항"
-        elif itype == "oil_spill":
-            hint = "유류유출 방제 기준, 해양환경관리법, MARPOL 협약, 보험 약관 오염조항"
-        elif itype == "collision":
-            hint = "선박 충돌 관련 해사안전법, 국제충돌예방규칙 COLREGS, 보험 약관 충돌조항"
-        elif itype == "crew_injury":
-            hint = "선원 재해 보상, 선원법, 산재보험 관련 규정, 보험 약관 인적사고 조항"
-        else:
-            hint = "해상보험 일반 약관, 선박사고 일반 규정"
+        itype = (incident_type or incident_data.get("incident_type") or "generic").lower()
+        hint = _SEED_HINTS.get(itype, _SEED_HINTS["generic"])
 
         # 최종 seed는 “사건 설명 + 검색 힌트” 합본. RAG에 그대로 넣을 질문 재료.
         seed = f"{desc}\n\n[검색 힌트]\n{hint}"
@@ -69,25 +184,49 @@ class InsuranceReportService:
         seed_query: str,
         model: str = "gpt-4o-mini",
         temperature: float = 0.0,
+        collections: Optional[List[str]] = None,
     ) -> str:
         """
         RAGChain으로 법령/약관 컨텍스트 생성.
         - temperature는 낮게: 사실기반 요약/편집에 유리
+        - collections를 주면 법령/약관/판례 등 여러 컬렉션을 동시에 검색해서 병합
+        - 같은 조건의 결과는 RAG_CONTEXT_CACHE_TTL초 동안 재사용 (seed 완전 일치만, 의미 기반 캐시는 쓰지 않음)
+        - 검색 대상 컬렉션에 문서가 추가되면 (청크 수가 바뀌면) 이전 결과는 쓰지 않음
         """
-        rag = RAGChain(
-            collection=collection,
-            top_k=top_k,
-            model=model,
-            temperature=temperature,
-            include_sources=True,
+        # 검색 대상 컬렉션별 청크 수를 키에 포함 → 어느 프로세스에서든 새 문서가 수집되면 자동으로 캐시 미스
+        vs = get_vectorstore_service()
+        generation = ",".join(str(vs.count(c)) for c in (collections or [collection]))
+        key = hashlib.blake2b(
+            "\x1f".join(
+                (collection, "+".join(collections or ()), str(top_k), model, str(temperature), generation, seed_query)
+            ).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        now = time.monotonic()
+        with self._ctx_lock:
+            hit = self._ctx_cache.get(key)
+            if hit is not None and now - hit[0] < _RAG_CTX_CACHE_TTL:
+                self._ctx_cache.move_to_end(key)
+                return hit[1]
+
+        rag = _rag_chain(
+            collection, top_k, model, temperature, tuple(collections) if collections else None, use_cache=False
         )
-        return rag.run(seed_query)
+        rag_ctx = rag.run(seed_query)
+
+        if _RAG_CTX_CACHE_TTL > 0:
+            with self._ctx_lock:
+                self._ctx_cache[key] = (now, rag_ctx)
+                self._ctx_cache.move_to_end(key)
+                while len(self._ctx_cache) > _RAG_CTX_CACHE_SIZE:
+                    self._ctx_cache.popitem(last=False)
+        return rag_ctx
 
     # ---------- 퍼블릭 API ----------
     def generate_insurance_report_pdf(
         self,
         task_id: str,
-        incident_data: Dict[str, Any],
+        incident_data: IncidentData,
         incident_type: Optional[str] = None,
         use_rag: bool = True,
         collection: str = "default",
@@ -95,6 +234,7 @@ class InsuranceReportService:
         title: str = "해양 보험 청구 보고서",
         model: str = "gpt-4o-mini",
         temperature: float = 0.1,
+        collections: Optional[List[str]] = None,
     ):
         """
         1) (옵션) RAG 컨텍스트 생성
@@ -120,25 +260,20 @@ class InsuranceReportService:
                 seed_query=seed,
                 model=model,
                 temperature=0.0,  # 사실요약은 낮게
+                collections=collections,
             )
 
         # 2️. 사고 유형별 보고서 생성
-        chain = ReportChain(model=model, temperature=temperature)
+        chain = _report_chain(model, temperature)
         resolved_type = (incident_type or incident_data.get("incident_type", "generic")).lower()
 
+        # PDF는 완성된 본문으로 한 번에 렌더링하므로 스트리밍 없이 한 번에 받음 (generate_report는 항상 str 반환)
         report_text = chain.generate_report(
             incident_data=incident_data,
             rag_context=rag_ctx,
             incident_type=resolved_type,
         )
 
-        # LangChain 0.2.x 이상에서는 LLM 응답이 str이 아닌 AIMessage 객체로 나오더라 -> 안전하게 문자열로 변환.
-        if hasattr(report_text, "content"):  # 예: AIMessage(content="텍스트...")
-            report_text = report_text.content
-        elif not isinstance(report_text, str):
-            # 혹시나 content 외 다른 형식이면 문자열로 변환
-            report_text = str(report_text)
-
         # 3.  PDF 저장
         path = os.path.join(self.reports_dir, f"{task_id}.pdf")
 
@@ -150,8 +285,12 @@ class InsuranceReportService:
         )
 
         try:
-            save_report_pdf(path, title=title, question=q, answer=report_text)
+            _render_pdf(path, title=title, question=q, answer=report_text)
+            self._saved.add(task_id)
             print(f"✅ 보고서 PDF 저장 완료: {path}")
+            store = get_report_store()
+            if store is not None:
+                store.upload(task_id, path)
         except Exception as e:
             print(f"❌ PDF 저장 중 오류 발생: {e}")
             raise e
@@ -161,7 +300,12 @@ class InsuranceReportService:
 
     def get_report_path(self, task_id: str) -> Optional[str]:
         path = os.path.join(self.reports_dir, f"{task_id}.pdf")
-        return path if os.path.exists(path) else None
+        if task_id in self._saved:  # 이 프로세스가 저장했거나 시작 시 있던 보고서
+            return path
+        if os.path.exists(path):  # 다른 프로세스(워커)가 저장한 보고서
+            self._saved.add(task_id)
+            return path
+        return None
 
 
 # -----------------------------------------------------------
@@ -176,7 +320,8 @@ class ReportService:
     def __init__(self):
         self.memory = MemoryManager()
         self.reports_dir = os.getenv("REPORTS_DIR", "./storage/reports")
-        os.makedirs(self.reports_dir, exist_ok=True)
+        _ensure_dir(self.reports_dir)
+        self._saved = _saved_reports(self.reports_dir)
 
     def qa_with_memory(
         self,
@@ -196,13 +341,7 @@ class ReportService:
         # 히스토리를 질문 앞에 붙여 프롬프트 강화
         prompt_text = f"{history}\n\n현재 질문: {question}\n"
 
-        rag = RAGChain(
-            collection=collection,
-            top_k=top_k,
-            model=model,
-            temperature=temperature,
-            include_sources=True,
-        )
+        rag = _rag_chain(collection, top_k, model, temperature)
         answer = rag.run(prompt_text)
 
         # 메모리 갱신
@@ -210,6 +349,32 @@ class ReportService:
         self.memory.add_ai(sid, answer)
         return answer, sid
 
+    async def qa_with_memory_stream(
+        self,
+        question: str,
+        session_id: Optional[str],
+        collection: str,
+        top_k: int,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.2,
+    ) -> AsyncIterator[str]:
+        """
+        qa_with_memory의 스트리밍 버전 - 답변 조각을 생성되는 대로 yield.
+        스트림이 끝나면 전체 답변으로 메모리 갱신.
+        """
+        sid = self.memory.ensure(session_id)
+        history = self.memory.history_text(sid)
+        prompt_text = f"{history}\n\n현재 질문: {question}\n"
+
+        rag = _rag_chain(collection, top_k, model, temperature)
+        parts: List[str] = []
+        async for chunk in rag.arun_stream(prompt_text):
+            parts.append(chunk)
+            yield chunk
+
+        self.memory.add_user(sid, question)
+        self.memory.add_ai(sid, "".join(parts))
+
     def generate_and_save_report(
         self,
         task_id: str,
@@ -233,8 +398,18 @@ class ReportService:
             temperature=temperature,
         )
         path = os.path.join(self.reports_dir, f"{task_id}.pdf")
-        save_report_pdf(path, title=title, question=question, answer=answer)
+        _render_pdf(path, title=title, question=question, answer=answer)
+        self._saved.add(task_id)
+        store = get_report_store()
+        if store is not None:
+            store.upload(task_id, path)
+        return path
 
     def get_report_path(self, task_id: str) -> Optional[str]:
         path = os.path.join(self.reports_dir, f"{task_id}.pdf")
-        return path if os.path.exists(path) else None
\ No newline at end of file
+        if task_id in self._saved:  # 이 프로세스가 저장했거나 시작 시 있던 보고서
+            return path
+        if os.path.exists(path):  # 다른 프로세스(워커)가 저장한 보고서
+            self._saved.add(task_id)
+            return path
+        return None
\ No newline at end of file
@@ -0,0 +1,65 @@
+
+"""
+ReportObjectStore - 생성된 PDF 보고서를 S3/MinIO에 업로드하고 presigned URL로 내려주기
+- 워커가 렌더링한 PDF를 오브젝트 스토리지에 올려두면, API 프로세스는 파일을 직접 읽어 보내지 않고
+  presigned URL로 리다이렉트만 하면 됨 (API 프로세스를 거치는 이중 I/O 제거)
+- REPORTS_S3_BUCKET이 없으면 비활성화 → 기존처럼 로컬 파일(REPORTS_DIR) 사용
+
+환경변수:
+- REPORTS_S3_BUCKET      : 업로드할 버킷명 (미설정 시 비활성화)
+- REPORTS_S3_PREFIX      : 오브젝트 키 prefix (기본: reports/)
+- REPORTS_S3_ENDPOINT    : MinIO 등 S3 호환 스토리지 엔드포인트 (선택)
+- REPORTS_URL_EXPIRES    : presigned URL 유효 시간(초) (기본: 3600)
+"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+
+class ReportObjectStore:
+    """
+    task_id.pdf ↔ s3://{bucket}/{prefix}{task_id}.pdf
+    """
+
+    def __init__(self, bucket: str):
+        import boto3  # 오브젝트 스토리지를 쓸 때만 필요
+
+        self.bucket = bucket
+        self.prefix = os.getenv("REPORTS_S3_PREFIX", "reports/")
+        self.expires = int(os.getenv("REPORTS_URL_EXPIRES", "3600"))
+        self.client = boto3.client("s3", endpoint_url=os.getenv("REPORTS_S3_ENDPOINT") or None)
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}{task_id}.pdf"
+
+    def upload(self, task_id: str, path: str):
+        """
+        로컬에 렌더링된 PDF 업로드
+        """
+        self.client.upload_file(path, self.bucket, self._key(task_id), ExtraArgs={"ContentType": "application/pdf"})
+
+    def presigned_url(self, task_id: str) -> Optional[str]:
+        """
+        업로드된 보고서가 있으면 presigned GET URL, 없으면 None
+        """
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(task_id))
+        except self.client.exceptions.ClientError:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(task_id)},
+            ExpiresIn=self.expires,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_report_store() -> Optional[ReportObjectStore]:
+    """
+    REPORTS_S3_BUCKET이 설정된 경우에만 공용 ReportObjectStore 반환
+    """
+    bucket = os.getenv("REPORTS_S3_BUCKET")
+    return ReportObjectStore(bucket) if bucket else None
@@ -0,0 +1,60 @@
+
+"""
+task_registry.py
+- 보고서 생성 태스크 상태 레지스트리 (프로세스 내 메모리)
+- task_id → TaskRecord(status, path, mtime) 를 보관해서 다운로드 폴링 시 파일시스템 조회 없이 바로 응답
+- 최근 MAX_TASKS개만 유지 (오래된 것부터 제거)
+
+※ arq 워커(별도 프로세스)에서 생성된 보고서는 이 레지스트리에 없으므로,
+  조회 실패 시 호출 측에서 기존 방식(파일/오브젝트 스토리지 확인)으로 넘어가야 함
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+MAX_TASKS = 10_000
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class TaskRecord:
+    status: str
+    path: Optional[str] = None
+    mtime: Optional[float] = None
+    error: Optional[str] = None
+
+
+TASKS: "OrderedDict[str, TaskRecord]" = OrderedDict()
+_lock = threading.Lock()  # 백그라운드 태스크(스레드)와 요청 핸들러가 동시에 접근
+
+
+def _put(task_id: str, record: TaskRecord):
+    with _lock:
+        TASKS[task_id] = record
+        TASKS.move_to_end(task_id)
+        while len(TASKS) > MAX_TASKS:
+            TASKS.popitem(last=False)
+
+
+def mark_pending(task_id: str):
+    _put(task_id, TaskRecord(status=PENDING))
+
+
+def mark_done(task_id: str, path: str):
+    _put(task_id, TaskRecord(status=DONE, path=path, mtime=time.time()))
+
+
+def mark_failed(task_id: str, error: str):
+    _put(task_id, TaskRecord(status=FAILED, error=error, mtime=time.time()))
+
+
+def get_task(task_id: str) -> Optional[TaskRecord]:
+    return TASKS.get(task_id)
@@ -10,6 +10,15 @@ RAG 벡터스토어 서비스
 환경변수:
 - OPENAI_API_KEY         : OpenAI API 키
 - RAG_PERSIST_DIR        : Chroma 영속 저장 위치 (기본: ./storage/chroma)
+- RAG_HNSW_SEARCH_EF     : 새 컬렉션의 HNSW 검색 ef (기본: 64, 클수록 recall↑ 속도↓)
+- RAG_PDF_BACKEND        : PDF 텍스트 추출 엔진 "pdfium" | "pypdf" (기본: pypdfium2가 설치돼 있으면 pdfium)
+- RAG_FLUSH_INTERVAL     : 수집 후 디스크 동기화(persist/사이드카 인덱스 저장)를 모아서 실행할 간격(초) (기본: 5)
+- RAG_INGEST_WORKERS     : 여러 파일 수집 시 동시에 로드할 파일 수 (기본: CPU 코어 수)
+- RAG_URL_CONCURRENCY    : URL 수집 시 동시에 보낼 HTTP 요청 수 (기본: 10)
+- RAG_BACKEND            : 검색용 벡터 인덱스 "chroma" | "int8" | "usearch_bf16" | "usearch_int8" (기본: chroma)
+                           chroma 외에는 검색용 벡터를 사이드카 인덱스로 따로 저장/검색, Chroma는 본문/메타데이터 원본
+- RAG_QUANTIZE           : (이전 설정) "int8"이면 RAG_BACKEND=int8과 같음
+- RAG_OVERSAMPLE         : 사이드카 인덱스 검색 시 k*n개 후보를 뽑아 FP16 원본 사본으로 재정렬 (기본: 4, 1이면 재정렬 안 함)
 
 RAG의 핵심은 “LLM이 모르는 사실을 외부에서 끌어다 쓴다”는 것임.
 GPT는 해양사고보험법이나 MARPOL 협약 전문을 통째로 기억하지 않기 때문에, 벡터스토어에 넣은 텍스트 조각들을 불러와서 
@@ -18,34 +27,244 @@ GPT는 해양사고보험법이나 MARPOL 협약 전문을 통째로 기억하
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import hashlib
 import os
-import tempfile
-from typing import List, Optional, Iterable
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from functools import cached_property, lru_cache
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, List, Optional, Iterable, Iterator, Tuple, Union
 
 from dotenv import load_dotenv
 
 # LangChain - Vector DB / Embeddings / Loaders / Splitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    WebBaseLoader,
-    TextLoader,
-    DirectoryLoader,
-)
+# - chromadb, Chroma 래퍼/임베딩/분할기/로더/LLM 필터는 import 비용이 커서 처음 쓰는 곳에서 import (워커 콜드 스타트 단축)
 from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
 
-# (선택) LLM 기반 필터/압축 검색기 추가 옵션
-# - 비용/지연이 늘 수 있어 기본은 False로 사용 권장
-from langchain.retrievers.document_compressors import LLMChainFilter
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain_openai import ChatOpenAI
+from app.services.llm_cache import CACHE_PREFIX, invalidate_cache
+
+# (선택) PDFium(C++) 기반 텍스트 추출 - pdfminer/pypdf 같은 순수 파이썬 파서보다 훨씬 빠름
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import OpenAIEmbeddings
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 
 load_dotenv()
 
 
+# -------------------------
+# 로더 (CPU 작업)
+# - 프로세스 풀(ProcessPoolExecutor)에서 실행할 수 있도록 모듈 함수로 분리
+# - 임베딩 클라이언트 등 pickle 불가능한 객체를 참조하지 않는다
+# -------------------------
+def _use_pdfium() -> bool:
+    return pdfium is not None and os.getenv("RAG_PDF_BACKEND", "pdfium").lower() == "pdfium"
+
+
+def iter_pdf_pages(pdf: Union[str, bytes], source: str) -> Iterator[Document]:
+    """
+    PDF(경로 또는 바이트) → 페이지별 Document를 하나씩 yield
+    - pypdfium2 사용 가능: PDFium으로 바로 추출 (바이트도 임시 파일 없이 메모리에서 처리)
+    - 그 외: 경로는 PyPDFLoader.lazy_load, 바이트는 pypdf.PdfReader(BytesIO)
+    """
+    if _use_pdfium():
+        doc = pdfium.PdfDocument(pdf)
+        try:
+            for i in range(len(doc)):
+                page = doc[i]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                yield Document(page_content=text, metadata={"source": source, "page": i})
+        finally:
+            doc.close()
+        return
+
+    if isinstance(pdf, bytes):
+        # 바이트는 임시 파일 없이 메모리에서 바로 파싱
+        from pypdf import PdfReader
+
+        for i, page in enumerate(PdfReader(BytesIO(pdf)).pages):
+            yield Document(page_content=page.extract_text() or "", metadata={"source": source, "page": i})
+        return
+
+    from langchain_community.document_loaders import PyPDFLoader
+
+    for page in PyPDFLoader(pdf).lazy_load():
+        page.metadata = {**page.metadata, "source": source}
+        yield page
+
+
+def load_pdf_path(path: str, source: Optional[str] = None) -> List[Document]:
+    """
+    로컬 PDF 파일 → 페이지별 Document 리스트 (source 메타: 지정값 또는 파일명)
+    """
+    return list(iter_pdf_pages(path, source or os.path.basename(path)))
+
+
+def load_pdf_bytes(content: bytes, filename: str) -> List[Document]:
+    """
+    바이트로 올라온 PDF 파일 → 페이지별 Document 리스트
+    """
+    return list(iter_pdf_pages(content, filename))
+
+
+def load_text_file(path: str) -> List[Document]:
+    """
+    로컬 .txt 파일 → Document 리스트 (source 메타: 파일명)
+    """
+    from langchain_community.document_loaders import TextLoader
+
+    docs = TextLoader(path).load()
+    for d in docs:
+        d.metadata = {**d.metadata, "source": os.path.basename(path)}
+    return docs
+
+
+def _html_to_document(html: str, url: str) -> Document:
+    """
+    HTML → Document (WebBaseLoader와 같은 bs4 추출: get_text + title/description/language 메타)
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": url}  # 출처 기록
+    if soup.title:
+        metadata["title"] = soup.title.get_text()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description:
+        metadata["description"] = description.get("content", "No description found.")
+    html_tag = soup.find("html")
+    if html_tag:
+        metadata["language"] = html_tag.get("lang", "No language found.")
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
+
+async def aload_urls(urls: List[str]) -> List[Document]:
+    """
+    웹 URL들을 동시에 GET(aiohttp, 최대 RAG_URL_CONCURRENCY개) → HTML 파싱 → Document 리스트 (source 메타: URL)
+    - URL마다 요청을 하나씩 기다리지 않으므로 전체 시간 ≈ 가장 느린 응답 하나
+    - 요청/재시도는 WebBaseLoader.fetch_all, 파싱(CPU)은 스레드에서
+    """
+    from langchain_community.document_loaders import WebBaseLoader
+
+    concurrency = int(os.getenv("RAG_URL_CONCURRENCY", "10"))
+    loader = WebBaseLoader(web_paths=urls, requests_per_second=concurrency)  # requests_per_second = 동시 요청 수 세마포어
+    htmls = await loader.fetch_all(urls)
+    return await asyncio.to_thread(lambda: [_html_to_document(html, url) for html, url in zip(htmls, urls)])
+
+
+def load_urls(urls: List[str]) -> List[Document]:
+    """
+    aload_urls의 동기 버전 (이벤트 루프가 없는 곳에서 호출)
+    """
+    return asyncio.run(aload_urls(urls))
+
+
+def _ingest_workers(n_files: int) -> int:
+    return max(1, min(n_files, int(os.getenv("RAG_INGEST_WORKERS", "0")) or os.cpu_count() or 1))
+
+
+def load_file(path: str) -> List[Document]:
+    """
+    단일 파일 로드 - 확장자에 맞는 Loader 선택 (그 외는 DirectoryLoader 기본값인 Unstructured 사용)
+    """
+    from langchain_community.document_loaders import TextLoader, UnstructuredFileLoader
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        return load_pdf_path(path, source=path)
+    elif ext in (".txt", ".md"):
+        loader = TextLoader(path)
+    else:
+        loader = UnstructuredFileLoader(path)
+    docs = loader.load()
+    for d in docs:
+        d.metadata.setdefault("source", path)
+    return docs
+
+
+# 분할 결과 캐시 크기 (본문 해시 → 청크 텍스트 목록)
+_SPLIT_CACHE_SIZE = 10_000
+
+# 임베딩 요청 1회에 묶을 최대 크기 (OpenAI 한도: 입력 2048개 / 요청당 약 30만 토큰)
+_EMBED_BATCH_ITEMS = 256
+_EMBED_BATCH_TOKENS = 200_000
+
+
+def _embedding_batches(texts: List[str]) -> List[Tuple[int, int]]:
+    """
+    텍스트 목록을 임베딩 요청 단위의 [start, end) 구간으로 나눔
+    - 토큰 수는 글자 수로 어림 (한글은 글자당 1토큰 안팎이라 len//4보다 보수적으로 잡음)
+    """
+    batches: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        n = len(text)
+        if i > start and (i - start >= _EMBED_BATCH_ITEMS or tokens + n > _EMBED_BATCH_TOKENS):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _distance_to_similarity(space: str, distances: List[float]) -> List[float]:
+    """
+    Chroma 거리 → 코사인 유사도 (결과 벡터를 따로 받아오지 않고 query가 돌려준 거리로 환산)
+    - cosine/ip: 1 - d
+    - l2(제곱 거리): OpenAI 임베딩은 단위 벡터이므로 |a-b|^2 = 2 - 2cos → 1 - d/2
+    """
+    if space == "l2":
+        return [1.0 - d / 2.0 for d in distances]
+    return [1.0 - d for d in distances]
+
+
+# RAG_BACKEND → 사이드카 인덱스 생성 함수 (persist_dir, collection)
+_SIDE_INDEXES = {
+    "int8": lambda d, c: _quantized_index().Int8VectorIndex(d, c),
+    "usearch_bf16": lambda d, c: _quantized_index().UsearchVectorIndex(d, c, dtype="bf16"),
+    "usearch_int8": lambda d, c: _quantized_index().UsearchVectorIndex(d, c, dtype="i8"),
+}
+
+
+def _quantized_index():
+    # 사이드카 인덱스(numpy)는 RAG_BACKEND가 chroma가 아닐 때만 필요
+    from app.services import quantized_index
+
+    return quantized_index
+
+
+class _ServiceRetriever(BaseRetriever):
+    """
+    VectorStoreService.search를 그대로 쓰는 Retriever
+    - 사이드카 인덱스 사용 시 Chroma(FP32) HNSW 대신 양자화 인덱스로 검색하고, 본문은 Chroma에서 id로 조회
+    """
+
+    service: Any  # VectorStoreService
+    collection: str
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return list(self.service.search(self.collection, query, self.k))
+
+
 class VectorStoreService:
     """
     문서 → [분할] → [임베딩] → [Chroma] → [Retriever]
@@ -58,32 +277,126 @@ class VectorStoreService:
         chunk_size: int = 800,
         chunk_overlap: int = 120,
         separators: Optional[List[str]] = None,
+        query_cache_size: int = 1024,
+        hnsw_space: str = "cosine",
+        hnsw_m: int = 32,
+        hnsw_construction_ef: int = 200,
+        hnsw_search_ef: Optional[int] = None,
+        max_concurrent_batches: int = 5,
+        oversample: Optional[int] = None,
     ):
-        # 1) 저장 경로
+        # 1) 저장 경로 + Chroma 클라이언트 (모든 컬렉션 핸들이 하나의 클라이언트를 공유)
         self.persist_dir = persist_dir or os.getenv("RAG_PERSIST_DIR", "./storage/chroma")
         os.makedirs(self.persist_dir, exist_ok=True)
+        import chromadb  # 서비스를 처음 만들 때 import (모듈 import만 하는 워커는 비용 없음)
+
+        self.client = chromadb.PersistentClient(path=self.persist_dir)
+
+        # 1-1) HNSW 인덱스 설정 - 새 컬렉션을 만들 때만 적용
+        #      (M, construction_ef는 생성 후 바꿀 수 없으므로 처음부터 명시)
+        self.hnsw_metadata = {
+            "hnsw:space": hnsw_space,
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": hnsw_construction_ef,
+            "hnsw:search_ef": hnsw_search_ef or int(os.getenv("RAG_HNSW_SEARCH_EF", "64")),
+        }
+
+        # 2) 임베딩 모델 (OpenAI) - 처음 쓸 때 생성 (embeddings 프로퍼티)
+        self.embedding_model = embedding_model
+
+        # 2-1) 수집 시 임베딩 배치 요청을 동시에 max_concurrent_batches개까지 보냄 (네트워크 왕복 시간 겹치기)
+        #      동기 경로는 스레드 풀, 비동기 경로(aadd_*)는 asyncio.Semaphore로 같은 한도를 적용
+        self.max_concurrent_batches = max_concurrent_batches
+        self._embed_pool = ThreadPoolExecutor(max_workers=max_concurrent_batches)
+
+        # 3) 분할기 설정 - 처음 쓸 때 생성 (splitter 프로퍼티)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+
+        # 4) 질의 캐시 (LRU) - 같은 질문의 임베딩/검색 결과를 재사용
+        #    key: sha256(질문) / (컬렉션, k, sha256(질문))
+        self.query_cache_size = query_cache_size
+        self._embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._search_cache: "OrderedDict[Tuple[str, int, str], Tuple[Tuple[Document, float], ...]]" = OrderedDict()
+        self._split_cache: "OrderedDict[bytes, List[str]]" = OrderedDict()  # blake2b(본문) → 분할 결과
+        self._cache_lock = threading.Lock()  # 수집(스레드 풀)과 검색이 동시에 캐시를 건드릴 수 있음
+
+        # 5) (선택) 양자화 검색 인덱스(사이드카) - Chroma는 문서/메타데이터 원본으로 유지
+        legacy = "int8" if os.getenv("RAG_QUANTIZE", "").lower() == "int8" else "chroma"
+        self.backend = os.getenv("RAG_BACKEND", legacy).lower()
+        if self.backend not in _SIDE_INDEXES and self.backend != "chroma":
+            raise ValueError(f"지원하지 않는 RAG_BACKEND: {self.backend}")
+        self.quantize = self.backend != "chroma"
+        self._side_indexes: dict = {}
+        # 5-1) 양자화 인덱스에서 k*oversample개 후보 → FP16 사본 내적으로 재정렬해서 상위 k개 (recall 보정)
+        self.oversample = max(1, oversample or int(os.getenv("RAG_OVERSAMPLE", "4")))
+
+        # 6) 컬렉션별 Chroma 핸들 캐시 (요청마다 Chroma 객체/컬렉션 조회를 새로 만들지 않음)
+        self._chroma_handles: dict = {}
+        self._chroma_lock = threading.Lock()
+
+        # 7) 디스크 동기화 지연(debounce) - 수집 때마다 바로 쓰지 않고 flush_interval초 동안 모아서 한 번에
+        self.flush_interval = float(os.getenv("RAG_FLUSH_INTERVAL", "5"))
+        self._dirty: set = set()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.Lock()
+
+
+    @cached_property
+    def embeddings(self) -> "OpenAIEmbeddings":
+        """
+        OpenAI 임베딩 클라이언트
+        - chunk_size: 한 번의 API 요청에 묶어 보낼 텍스트 수
+        - max_retries: 429/5xx는 OpenAI 클라이언트가 Retry-After를 지켜 지수 백오프로 재시도
+        - http(_async)_client: LLM과 같은 httpx 커넥션 풀 공유 (동기/비동기 수집 경로 모두 연결 재사용)
+        """
+        from langchain_openai import OpenAIEmbeddings
 
-        # 2) 임베딩 모델 (OpenAI)
-        self.embeddings = OpenAIEmbeddings(model=embedding_model)
+        from app.services.llm import _http_async_client, _http_client
 
-        # 3) 분할기
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=separators or ["\n\n", "\n", " ", ""],
+        return OpenAIEmbeddings(
+            model=self.embedding_model,
+            chunk_size=512,
+            max_retries=6,
+            http_client=_http_client(),
+            http_async_client=_http_async_client(),
         )
 
+    @cached_property
+    def splitter(self) -> "RecursiveCharacterTextSplitter":
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=self.separators,
+        )
     
     #임베딩된 벡터 저장 + 유사도 검색 지원
-    def _chroma(self, collection: str) -> Chroma:
+    def _chroma(self, collection: str) -> "Chroma":
         """
-        컬렉션명에 해당하는 Chroma 핸들러 생성/연결
+        컬렉션명에 해당하는 Chroma 핸들러 생성/연결 (컬렉션당 한 번만 만들고 재사용)
+        - 기존 컬렉션에는 메타데이터를 넘기지 않는다 (거리 함수/인덱스 설정이 덮어써지지 않도록)
         """
-        return Chroma(
-            collection_name=collection,
-            embedding_function=self.embeddings,
-            persist_directory=self.persist_dir,
-        )
+        store = self._chroma_handles.get(collection)
+        if store is not None:
+            return store
+        with self._chroma_lock:
+            store = self._chroma_handles.get(collection)
+            if store is None:
+                from langchain_community.vectorstores import Chroma
+
+                existing = set(self.list_collections())
+                store = Chroma(
+                    client=self.client,
+                    collection_name=collection,
+                    embedding_function=self.embeddings,
+                    persist_directory=self.persist_dir,
+                    collection_metadata=None if collection in existing else self.hnsw_metadata,
+                )
+                self._chroma_handles[collection] = store
+            return store
     
     """
     ex) 컬렉션은 DB에 저장될 내용 분류느낌 
@@ -98,36 +411,185 @@ class VectorStoreService:
     def _split(self, docs: List[Document]) -> List[Document]:
         """
         긴 문서를 청크 단위로 분할 (문맥 손실 최소화를 위해 overlap 사용)
+        - 같은 본문(반복되는 머리말/꼬리말 페이지, 재수집 문서)은 분할 결과를 재사용 (LRU)
+        """
+        chunks: List[Document] = []
+        for d in docs:
+            for text in self._split_text(d.page_content):
+                chunks.append(Document(page_content=text, metadata=dict(d.metadata)))
+        return chunks
+
+    def _split_text(self, text: str) -> List[str]:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._cache_lock:
+            parts = self._split_cache.get(key)
+            if parts is not None:
+                self._split_cache.move_to_end(key)
+                return parts
+        parts = self.splitter.split_text(text)
+        with self._cache_lock:
+            self._split_cache[key] = parts
+            if len(self._split_cache) > _SPLIT_CACHE_SIZE:
+                self._split_cache.popitem(last=False)
+        return parts
+
+    def _side_index(self, collection: str):
+        """
+        컬렉션별 사이드카 인덱스 (RAG_BACKEND에 맞는 구현, 최초 1회 디스크에서 로드)
+        """
+        with self._cache_lock:
+            if collection not in self._side_indexes:
+                self._side_indexes[collection] = _SIDE_INDEXES[self.backend](self.persist_dir, collection)
+            return self._side_indexes[collection]
+
+    def _new_chunks(self, collection: str, chunks: List[Document]) -> Tuple[List[str], List[str], List[dict]]:
+        """
+        본문 해시(id)로 배치 내 중복/이미 저장된 청크를 걸러내고 새로 저장할 (ids, texts, metadatas) 반환
+        """
+        store = self._chroma(collection)
+
+        # 본문 해시로 중복 제거 (배치 내 첫 청크만 유지)
+        unique: "OrderedDict[str, Document]" = OrderedDict()
+        for c in chunks:
+            unique.setdefault(hashlib.blake2b(c.page_content.encode("utf-8"), digest_size=16).hexdigest(), c)
+        existing = set(store._collection.get(ids=list(unique), include=[])["ids"])  # 내부 핸들 접근 (커뮤니티 드라이버 관례)
+        ids = [cid for cid in unique if cid not in existing]
+        return ids, [unique[cid].page_content for cid in ids], [unique[cid].metadata for cid in ids]
+
+    def _store_vectors(
+        self,
+        collection: str,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        embeddings: List[List[float]],
+    ):
+        """
+        미리 계산한 벡터를 Chroma(+ 사이드카 인덱스)에 저장
         """
-        return self.splitter.split_documents(docs)
+        self._chroma(collection)._collection.add(  # 내부 핸들 접근 (커뮤니티 드라이버 관례)
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas,
+        )
+        if self.quantize:
+            self._side_index(collection).add(ids, embeddings)
+        self._invalidate_search_cache(collection)  # 새 문서가 들어왔으니 이 컬렉션의 검색 캐시는 무효
+        invalidate_cache(self.client, collection)  # 이 컬렉션을 근거로 한 LLM 답변 캐시도 무효
+
+    def _embed_and_store(self, collection: str, chunks: List[Document]) -> int:
+        """
+        청크 전체를 요청 한도에 맞춘 배치로 일괄 임베딩 → 벡터와 함께 Chroma에 저장
+        - 청크마다 임베딩 요청을 보내지 않고, 미리 계산한 벡터를 그대로 넘긴다
+        - 배치: 최대 _EMBED_BATCH_ITEMS개 / 어림 _EMBED_BATCH_TOKENS 토큰
+        - id = 본문 해시 → 이미 컬렉션에 있는 청크(개정 법령의 반복 조문 등)와 배치 내 중복은 임베딩/저장 생략
+        """
+        if not chunks:
+            return 0
+        ids, texts, metadatas = self._new_chunks(collection, chunks)
+        if ids:
+            self._store_vectors(collection, ids, texts, metadatas, self._embed_batches(texts))
+        return len(chunks)
+
+    async def _aembed_and_store(self, collection: str, chunks: List[Document]) -> int:
+        """
+        _embed_and_store의 비동기 버전
+        - 임베딩은 aembed_documents로 이벤트 루프에서 동시에 요청 (스레드 없이 I/O 겹치기)
+        - Chroma 조회/저장은 동기 API이므로 스레드로 넘김
+        """
+        if not chunks:
+            return 0
+        ids, texts, metadatas = await asyncio.to_thread(self._new_chunks, collection, chunks)
+        if ids:
+            embeddings = await self._aembed_batches(texts)
+            await asyncio.to_thread(self._store_vectors, collection, ids, texts, metadatas, embeddings)
+        return len(chunks)
+
+    def _embed_batches(self, texts: List[str]) -> List[List[float]]:
+        """
+        배치별 embed_documents를 스레드 풀에서 동시에 실행 → 입력 순서대로 벡터 재조립
+        - 첫 배치 이후는 0~100ms 지터를 두고 시작해서 동시 요청이 한꺼번에 몰리지 않게 함 (429 완화)
+        """
+        batches = _embedding_batches(texts)
+        if len(batches) == 1:
+            return self.embeddings.embed_documents(texts)
+
+        def embed(i: int, start: int, end: int) -> List[List[float]]:
+            if i:
+                time.sleep(random.uniform(0, 0.1))
+            return self.embeddings.embed_documents(texts[start:end])
+
+        futures = [self._embed_pool.submit(embed, i, start, end) for i, (start, end) in enumerate(batches)]
+        vectors: List[List[float]] = [None] * len(texts)  # type: ignore[list-item]
+        for (start, end), future in zip(batches, futures):
+            vectors[start:end] = future.result()
+        return vectors
+
+    async def _aembed_batches(self, texts: List[str]) -> List[List[float]]:
+        """
+        배치별 aembed_documents를 asyncio.gather로 동시에 실행 (동시 요청은 max_concurrent_batches개까지)
+        - gather는 입력 순서대로 결과를 돌려주므로 그대로 이어 붙이면 texts 순서와 같음
+        """
+        batches = _embedding_batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+
+        async def embed(start: int, end: int) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(texts[start:end])
+
+        results = await asyncio.gather(*[embed(start, end) for start, end in batches])
+        return list(chain.from_iterable(results))
 
     def _persist(self, collection: str):
         """
-        현재 컬렉션 상태를 디스크에 영속화
+        컬렉션을 '동기화 필요'로 표시 → flush_interval초 뒤 flush에서 한 번에 영속화
+        """
+        with self._flush_lock:
+            self._dirty.add(collection)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """
+        표시된 컬렉션의 Chroma persist + 사이드카 인덱스 저장 (종료 시에도 호출)
         """
-        self._chroma(collection).persist()
+        with self._flush_lock:
+            dirty, self._dirty = self._dirty, set()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        for collection in dirty:
+            if self.quantize:
+                self._side_index(collection).save()
+            self._chroma(collection).persist()
 
     # -------------------------
     # 수집(Ingest)
     # -------------------------
 
+    def add_documents(self, collection: str, docs: List[Document]) -> int:
+        """
+        이미 로드된 Document 리스트 → 분할 → 임베딩/저장
+        (로딩을 별도 프로세스에서 끝낸 뒤 임베딩만 이어서 할 때 사용)
+        """
+        chunks = self._split(docs)
+        self._embed_and_store(collection, chunks)
+        self._persist(collection)
+        return len(chunks)
+
     #웹 문서 URL을 넣고 HTML 파싱 
     def add_from_urls(self, collection: str, urls: List[str]) -> int:
         """
-        웹 URL에서 문서를 로드 → 분할 → 임베딩/저장
-        """
-        all_docs: List[Document] = []
-        for url in urls:
-            loader = WebBaseLoader(url)
-            docs = loader.load()
-            # 출처 기록
-            for d in docs:
-                d.metadata = {**d.metadata, "source": url}
-            all_docs.extend(docs)
- 
+        웹 URL에서 문서를 로드(동시 GET) → 분할 → 임베딩/저장
+        - 실행 중인 이벤트 루프 안에서는 aadd_from_urls를 사용
+        """
+        all_docs = load_urls(urls)
+
         chunks = self._split(all_docs) #문서 분할하고
-        store = self._chroma(collection) #벡터 DB연결하고 
-        store.add_documents(chunks) #각 청크의 텍스트를 OpenAI 임베딩 API로 전송 
+        self._embed_and_store(collection, chunks) #청크 전체를 한 번에 임베딩해서 벡터 DB에 저장
         self._persist(collection)
         return len(chunks)
 
@@ -137,8 +599,7 @@ class VectorStoreService:
         """
         docs = [Document(page_content=t, metadata={"source": source}) for t in texts]
         chunks = self._split(docs) #청크 단위로 나누고,
-        store = self._chroma(collection) #지정한 컬렉션, OpenAI 임베딩 모델과 저장경로에 맞추어 벡터 DB 연결.
-        store.add_documents(chunks) # 각 청크를 OpenAI API로 전송, 벡터 + 원시 텍스트 + 메타데이터를 ChromaDB에 저장
+        self._embed_and_store(collection, chunks) # 청크 전체를 한 번에 임베딩, 벡터 + 원시 텍스트 + 메타데이터를 ChromaDB에 저장
         self._persist(collection) # 디스크 동기화 
         return len(chunks)
 
@@ -158,41 +619,49 @@ class VectorStoreService:
     """
     def add_from_pdf_bytes(self, collection: str, content: bytes, filename: str) -> int:
         """
-        바이트로 올라온 PDF 파일을 임시 경로에 저장해서 → PyPDFLoader 로드 → 분할/저장
+        바이트로 올라온 PDF 파일 로드(iter_pdf_pages) → 분할/저장
         FastAPI 업로드와 연결되는 경로
         """
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        try:
-            loader = PyPDFLoader(tmp_path)
-            docs = loader.load()
-            for d in docs:
-                d.metadata = {**d.metadata, "source": filename}
-            chunks = self._split(docs)
-            store = self._chroma(collection)
-            store.add_documents(chunks)
-            self._persist(collection)
-            return len(chunks)
-        finally:
-            os.remove(tmp_path)
+        return self.add_documents(collection, load_pdf_bytes(content, filename))
 
+    def add_from_pdf_path(
+        self,
+        collection: str,
+        path: str,
+        source: Optional[str] = None,
+        pages_per_batch: int = 16,
+    ) -> int:
+        """
+        로컬 PDF 한 개를 페이지 단위로 읽으면서 → 분할/임베딩/저장을 배치마다 바로 수행
+        - 전체 문서를 메모리에 올리지 않으므로 대용량 PDF도 페이지 배치 크기만큼의 메모리로 처리
+        """
+        total = 0
+        batch: List[Document] = []
+        for page in iter_pdf_pages(path, source or os.path.basename(path)):
+            batch.append(page)
+            if len(batch) >= pages_per_batch:
+                total += self._embed_and_store(collection, self._split(batch))
+                batch = []
+        if batch:
+            total += self._embed_and_store(collection, self._split(batch))
+        self._persist(collection)
+        return total
 
     def add_from_pdf_paths(self, collection: str, pdf_paths: List[str]) -> int:
         """
         로컬 PDF 경로들에서 로드 → 분할/저장
+        - 파일이 여러 개면 프로세스 풀에서 동시에 파싱 (PDF 파싱은 CPU 바운드)
         """
-        all_docs: List[Document] = []
-        for path in pdf_paths:
-            loader = PyPDFLoader(path)
-            docs = loader.load()
-            for d in docs:
-                d.metadata = {**d.metadata, "source": os.path.basename(path)}
-            all_docs.extend(docs)
+        workers = _ingest_workers(len(pdf_paths))
+        if workers == 1:
+            results = map(load_pdf_path, pdf_paths)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(load_pdf_path, pdf_paths))
+        all_docs = list(chain.from_iterable(results))
 
         chunks = self._split(all_docs)
-        store = self._chroma(collection)
-        store.add_documents(chunks)
+        self._embed_and_store(collection, chunks)
         self._persist(collection)
         return len(chunks)
 
@@ -207,6 +676,8 @@ class VectorStoreService:
         폴더 전체 일괄 수집 (PDF/텍스트 등)
         - DirectoryLoader가 내부적으로 파일 확장자에 맞는 Loader를 선택
         """
+        from langchain_community.document_loaders import DirectoryLoader
+
         loader = DirectoryLoader(
             dir_path,
             glob=glob,
@@ -219,32 +690,144 @@ class VectorStoreService:
             if "source" not in d.metadata:
                 d.metadata["source"] = d.metadata.get("file_path", "directory")
         chunks = self._split(docs)
-        store = self._chroma(collection)
-        store.add_documents(chunks)
+        self._embed_and_store(collection, chunks)
         self._persist(collection)
         return len(chunks)
 
     def add_from_text_files(self, collection: str, paths: List[str]) -> int:
         """
         로컬 .txt 파일들을 TextLoader로 수집
+        - 파일이 여러 개면 스레드 풀에서 동시에 읽음 (디스크 I/O 바운드)
         """
-        all_docs: List[Document] = []
-        for path in paths:
-            loader = TextLoader(path)
-            docs = loader.load()
-            for d in docs:
-                d.metadata = {**d.metadata, "source": os.path.basename(path)}
-            all_docs.extend(docs)
+        with ThreadPoolExecutor(max_workers=_ingest_workers(len(paths))) as pool:
+            all_docs = list(chain.from_iterable(pool.map(load_text_file, paths)))
 
         chunks = self._split(all_docs)
-        store = self._chroma(collection)
-        store.add_documents(chunks)
+        self._embed_and_store(collection, chunks)
         self._persist(collection)
         return len(chunks)
 
+    # -------------------------
+    # 비동기 수집(Async Ingest) - FastAPI 핸들러에서 await로 호출 (이벤트 루프를 막지 않음)
+    # -------------------------
+
+    async def aadd_documents(self, collection: str, docs: List[Document]) -> int:
+        """
+        add_documents의 비동기 버전: 분할은 스레드에서, 임베딩은 aembed_documents로 동시에
+        """
+        chunks = await asyncio.to_thread(self._split, docs)
+        await self._aembed_and_store(collection, chunks)
+        self._persist(collection)
+        return len(chunks)
+
+    async def aadd_from_urls(self, collection: str, urls: List[str]) -> int:
+        """
+        add_from_urls의 비동기 버전 (URL들을 현재 이벤트 루프에서 동시에 가져옴)
+        """
+        return await self.aadd_documents(collection, await aload_urls(urls))
+
+    async def aadd_from_texts(self, collection: str, texts: List[str], source: str = "text") -> int:
+        """
+        add_from_texts의 비동기 버전
+        """
+        docs = [Document(page_content=t, metadata={"source": source}) for t in texts]
+        return await self.aadd_documents(collection, docs)
+
+    async def aadd_from_pdf_bytes(self, collection: str, content: bytes, filename: str) -> int:
+        """
+        add_from_pdf_bytes의 비동기 버전 (PDF 텍스트 추출은 스레드에서)
+        """
+        return await self.aadd_documents(collection, await asyncio.to_thread(load_pdf_bytes, content, filename))
+
     # -------------------------
     # 검색(Retrieve)
     # -------------------------
+    def embed_query(self, text: str) -> List[float]:
+        """
+        질문 임베딩 (LRU 캐시) - 캐시 확인/검색 등에서 같은 질문을 여러 번 임베딩하지 않도록
+        """
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            vec = self._embed_cache.get(key)
+            if vec is not None:
+                self._embed_cache.move_to_end(key)
+                return vec
+        vec = self.embeddings.embed_query(text)
+        with self._cache_lock:
+            self._embed_cache[key] = vec
+            if len(self._embed_cache) > self.query_cache_size:
+                self._embed_cache.popitem(last=False)
+        return vec
+
+    def search(self, collection: str, query: str, k: int = 4) -> Tuple[Document, ...]:
+        """
+        유사도 검색 (LRU 캐시) - 문서만 반환
+        """
+        return tuple(doc for doc, _ in self.search_with_scores(collection, query, k))
+
+    def search_with_scores(
+        self, collection: str, query: str, k: int = 4
+    ) -> Tuple[Tuple[Document, float], ...]:
+        """
+        유사도 검색 (LRU 캐시) - (문서, 코사인 유사도) 반환
+        - LangChain Retriever를 거치지 않고 임베딩 1회 + Chroma query 1회로 바로 검색
+        - 같은 (컬렉션, k, 질문)은 한 번만 검색하고 결과 재사용 (수집 시 해당 컬렉션 캐시 무효화)
+        - 점수는 컬렉션의 거리 함수(l2/cosine/ip)와 관계없이 코사인 유사도로 환산해서 통일
+          → 여러 컬렉션 결과를 같은 기준으로 병합 가능
+        """
+        key = (collection, k, hashlib.sha256(query.encode("utf-8")).hexdigest())
+        with self._cache_lock:
+            hits = self._search_cache.get(key)
+            if hits is not None:
+                self._search_cache.move_to_end(key)
+                return hits
+
+        vec = self.embed_query(query)
+        if self.quantize and len(self._side_index(collection)):
+            hits = self._search_side_index(collection, vec, k)
+        else:
+            handle = self._chroma(collection)._collection  # 내부 핸들 접근 (커뮤니티 드라이버 관례)
+            result = handle.query(
+                query_embeddings=[vec],
+                n_results=k,
+                include=["documents", "metadatas", "distances"],  # 결과 벡터는 받지 않음 (히트당 float 수천 개 전송 생략)
+            )
+            space = (handle.metadata or {}).get("hnsw:space", "l2")
+            sims = _distance_to_similarity(space, result["distances"][0])
+            hits = tuple(
+                (Document(page_content=text, metadata=meta or {}), sim)
+                for text, meta, sim in zip(result["documents"][0], result["metadatas"][0], sims)
+            )
+        with self._cache_lock:
+            self._search_cache[key] = hits
+            if len(self._search_cache) > self.query_cache_size:
+                self._search_cache.popitem(last=False)
+        return hits
+
+    def _search_side_index(
+        self, collection: str, vec: List[float], k: int
+    ) -> Tuple[Tuple[Document, float], ...]:
+        """
+        사이드카 인덱스로 상위 k개 id 검색(k*oversample개 후보 → FP16 재정렬) → Chroma에서 id로 본문/메타데이터 조회
+        """
+        scored = self._side_index(collection).search(vec, k, oversample=self.oversample)
+        got = self._chroma(collection)._collection.get(
+            ids=[i for i, _ in scored], include=["documents", "metadatas"]
+        )
+        by_id = {
+            i: Document(page_content=text, metadata=meta or {})
+            for i, text, meta in zip(got["ids"], got["documents"], got["metadatas"])
+        }
+        return tuple((by_id[i], sim) for i, sim in scored if i in by_id)  # 유사도 순서 유지
+
+    def _invalidate_search_cache(self, collection: str):
+        """
+        해당 컬렉션의 검색 결과 캐시 제거
+        """
+        with self._cache_lock:
+            for key in [key for key in self._search_cache if key[0] == collection]:
+                del self._search_cache[key]
+
     def get_retriever( #벡터 DB에서 유사한 문서를 검색하는 객체(Retriever) 생성
         self,
         collection: str,
@@ -260,23 +843,33 @@ class VectorStoreService:
         - k: 가져올 문서 수
         - score_threshold: search_type이 similarity_score_threshold일 때 임계값
         """
-        store = self._chroma(collection)
+        if self.quantize and search_type == "similarity":
+            # 양자화 인덱스 검색 + FP16 재정렬 (캐시 포함) - 인덱스가 비어 있으면 search가 Chroma로 넘어감
+            base_retriever = _ServiceRetriever(service=self, collection=collection, k=k)
+        else:
+            store = self._chroma(collection)
 
-        search_kwargs = {"k": k}
-        if search_type == "similarity_score_threshold" and score_threshold is not None:
-            search_kwargs["score_threshold"] = score_threshold
+            search_kwargs = {"k": k}
+            if search_type == "similarity_score_threshold" and score_threshold is not None:
+                search_kwargs["score_threshold"] = score_threshold
 
-        base_retriever = store.as_retriever(
-            search_type=search_type,
-            search_kwargs=search_kwargs,
-        )
+            base_retriever = store.as_retriever(
+                search_type=search_type,
+                search_kwargs=search_kwargs,
+            )
 
         if not enable_llm_filter:
             return base_retriever
 
+        # (선택) LLM 기반 필터/압축 검색기 - 비용/지연이 늘 수 있어 기본은 False로 사용 권장
+        from langchain.retrievers import ContextualCompressionRetriever
+        from langchain.retrievers.document_compressors import LLMChainFilter
+
+        from app.services.llm import get_llm
+
         # 2차 LLM 필터링 단계 (문맥 압축): 반환 문서 수를 줄여 노이즈 감소 (비용/지연↑) 일단 false로 해놓자. 
         compressor = LLMChainFilter.from_llm( #검색된 문서를 ChatGPT에게 보여주고 "이게 쿼리랑 관련 있어?" 물어봄
-            llm=ChatOpenAI(model=llm_model, temperature=0.0)
+            llm=get_llm(llm_model, 0.0)
         )
         return ContextualCompressionRetriever(
             base_compressor=compressor,
@@ -294,15 +887,13 @@ class VectorStoreService:
 
     def list_collections(self) -> List[str]:
         """
-        현재 persist_dir에 존재하는 컬렉션 목록 (간단 버전)
+        현재 persist_dir에 존재하는 컬렉션 목록
+        - 공용 PersistentClient의 메타데이터 조회 한 번 (Chroma 핸들을 만들지 않음)
+        - chromadb 0.6+는 이름(str), 이전 버전은 Collection 객체를 돌려주므로 둘 다 처리
+        - SemanticCache 전용 컬렉션(llmcache_*)은 문서 컬렉션이 아니므로 제외
         """
-        # Chroma API가 컬렉션 나열을 직접 제공하지 않으므로, 디렉토리 스캔 또는 메타 유지가 필요.
-        # 여기선 간단히 디렉토리 스캔(컬렉션 당 별도 메타를 쓰지 않으므로 best-effort).
-        names: List[str] = []
-        # chroma는 내부적으로 sqlite/duckdb 등 저장하므로 파일명으로 추론이 어렵다.
-        # 실서비스에선 별도의 메타파일을 관리할 것을 권장.
-        # 일단은 None 리턴로 두거나, 필요한 경우 확장.
-        return names
+        names = (getattr(c, "name", c) for c in self.client.list_collections())
+        return [name for name in names if not name.startswith(CACHE_PREFIX)]  # LLM 응답 캐시 컬렉션 제외
 
     def count_documents(self, collection: str) -> int:
         """
@@ -315,3 +906,15 @@ class VectorStoreService:
         sources = {m.get("source") for m in metadatas if m.get("source")}
         return len(sources)
 
+
+# -------------------------
+# 공용 인스턴스
+# -------------------------
+@lru_cache(maxsize=1)
+def get_vectorstore_service() -> VectorStoreService:
+    """
+    프로세스당 하나의 VectorStoreService 공유 (임베딩 클라이언트/Chroma 핸들/질의 캐시 재사용)
+    """
+    service = VectorStoreService()
+    atexit.register(service.flush)  # 종료 전에 남은 동기화 처리
+    return service
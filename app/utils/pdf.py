@@ -1,23 +1,108 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+# reportlab은 import 비용이 커서(콜드 스타트 ~100ms) 실제로 PDF를 만들 때 함수 안에서 import
 from datetime import datetime
+from io import BytesIO
+import os
+import re
 
+_FONT_NAME = "HYSMyeongJo-Medium"
+_font_registered = False
 
-def save_report_pdf(path: str, title: str, question: str, answer: str):
+
+def _register_font():
+    """
+    한글 CID 폰트는 프로세스당 한 번만 등록 (registerFont가 매번 CMap을 다시 읽지 않도록)
+    """
+    global _font_registered
+    if not _font_registered:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        pdfmetrics.registerFont(UnicodeCIDFont(_FONT_NAME))
+        _font_registered = True
+
+
+_STYLES = None
+
+
+def _styles():
+    """
+    보고서 스타일시트 - 첫 렌더링 때 한 번만 만들고 이후 재사용 (ParagraphStyle 생성/검증 반복 제거)
+    """
+    global _STYLES
+    if _STYLES is None:
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+        styles = getSampleStyleSheet()
+        # 기존 스타일 이름과 충돌 방지 → "Custom..." 으로 변경
+        styles.add(ParagraphStyle(name="CustomTitle", fontName=_FONT_NAME, fontSize=18, leading=24, spaceAfter=12, alignment=1))
+        styles.add(ParagraphStyle(name="CustomHeading1", fontName=_FONT_NAME, fontSize=14, leading=20, spaceBefore=14, spaceAfter=8))
+        styles.add(ParagraphStyle(name="CustomHeading2", fontName=_FONT_NAME, fontSize=12, leading=18, spaceBefore=8, spaceAfter=6))
+        styles.add(ParagraphStyle(name="CustomBody", fontName=_FONT_NAME, fontSize=11, leading=16, spaceAfter=6))
+        styles.add(ParagraphStyle(name="CustomCode", fontName=_FONT_NAME, fontSize=10, leading=14, backColor="#f4f4f4"))
+        _STYLES = styles
+    return _STYLES
+
+
+def save_report_pdf(path: str, title: str, question: str, answer: str, fast: bool = True):
     """
     보고서 텍스트를 PDF로 보기 좋게 저장하는 함수.
+    - 메모리에서 렌더링한 뒤 임시 파일에 한 번에 쓰고 os.replace로 교체
+      → 다운로드 폴링 쪽에서 쓰는 중인(불완전한) 파일을 보지 않음
+    """
+    data = render_report_pdf(title, question, answer, fast=fast)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# Markdown 비슷한 줄 구분 - 줄마다 startswith 4번 대신 정규식 한 번 + 딕셔너리 조회
+_MD_RE = re.compile(r"(?P<h1># )|(?P<h2>## )|(?P<li>- )|(?P<b>\*\*)")
+_MD_ANY_RE = re.compile(r"^[ \t]*(?:#{1,2} |- |\*\*)", re.M)
+# Paragraph가 해석하는 인라인 마크업/엔티티 (<b>, <br/>, &amp; 등) - canvas 경로는 글자 그대로 찍으므로 platypus로 보냄
+_MARKUP_RE = re.compile(r"<[A-Za-z/!]|&(?:#\d+|#x[0-9A-Fa-f]+|[A-Za-z]+);")
+
+# 제목 줄: 종류 → (스타일명, 잘라낼 머리말 길이)
+_MD_HEADINGS = {"h1": ("CustomHeading1", 2), "h2": ("CustomHeading2", 3)}
+# 본문 줄: 종류 → 출력 텍스트 (None = 일반 줄)
+_MD_BODY = {
+    "li": lambda line: f"• {line[2:]}",
+    "b": lambda line: f"<b>{line}</b>",
+    None: lambda line: line,
+}
+
+
+def _has_markdown(text: str) -> bool:
+    return _MD_ANY_RE.search(text) is not None
+
+
+def _needs_platypus(title: str, question: str, answer: str) -> bool:
+    """
+    canvas 경로로 같은 결과를 낼 수 없는 입력인지 - 답변의 Markdown 서식, 또는 어느 필드든 Paragraph 마크업/엔티티
+    """
+    return _has_markdown(answer) or any(_MARKUP_RE.search(t) for t in (title, question, answer))
+
+
+def render_report_pdf(title: str, question: str, answer: str, fast: bool = True) -> bytes:
+    """
+    보고서 텍스트를 PDF 바이트로 렌더링.
     Markdown 비슷한 형식을 유지하며, 한글 폰트 적용.
+    - fast=True이고 Markdown 서식/Paragraph 마크업이 없으면 platypus 없이 canvas로 바로 그림 (_render_report_pdf_fast)
+      → 두 경로의 출력 내용은 같고(마크업이 있으면 항상 platypus), canvas 쪽이 배치 비용만 적음
     """
+    if fast and not _needs_platypus(title, question, answer):
+        return _render_report_pdf_fast(title, question, answer)
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
     # ✅ 한글 폰트 등록
-    pdfmetrics.registerFont(UnicodeCIDFont("HYSMyeongJo-Medium"))
+    _register_font()
 
-    # ✅ 문서 객체 생성
+    # ✅ 문서 객체 생성 (메모리 버퍼에 렌더링)
+    buf = BytesIO()
     doc = SimpleDocTemplate(
-        path,
+        buf,
         pagesize=A4,
         rightMargin=40,
         leftMargin=40,
@@ -25,13 +110,7 @@ def save_report_pdf(path: str, title: str, question: str, answer: str):
         bottomMargin=40,
     )
 
-    styles = getSampleStyleSheet()
-    # 기존 스타일 이름과 충돌 방지 → "Custom..." 으로 변경
-    styles.add(ParagraphStyle(name="CustomTitle", fontName="HYSMyeongJo-Medium", fontSize=18, leading=24, spaceAfter=12, alignment=1))
-    styles.add(ParagraphStyle(name="CustomHeading1", fontName="HYSMyeongJo-Medium", fontSize=14, leading=20, spaceBefore=14, spaceAfter=8))
-    styles.add(ParagraphStyle(name="CustomHeading2", fontName="HYSMyeongJo-Medium", fontSize=12, leading=18, spaceBefore=8, spaceAfter=6))
-    styles.add(ParagraphStyle(name="CustomBody", fontName="HYSMyeongJo-Medium", fontSize=11, leading=16, spaceAfter=6))
-    styles.add(ParagraphStyle(name="CustomCode", fontName="HYSMyeongJo-Medium", fontSize=10, leading=14, backColor="#f4f4f4"))
+    styles = _styles()
 
     content = []
 
@@ -42,9 +121,9 @@ def save_report_pdf(path: str, title: str, question: str, answer: str):
 
     # 🔹 질문 섹션
     content.append(Paragraph("<b>[질문]</b>", styles["CustomHeading1"]))
-    for line in question.split("\n"):
-        if line.strip():
-            content.append(Paragraph(line.strip(), styles["CustomBody"]))
+    lines = [line.strip() for line in question.split("\n") if line.strip()]
+    if lines:
+        content.append(Paragraph("<br/>".join(lines), styles["CustomBody"]))
 
     content.append(Spacer(1, 12))
 
@@ -52,20 +131,29 @@ def save_report_pdf(path: str, title: str, question: str, answer: str):
     content.append(Paragraph("<b>[답변]</b>", styles["CustomHeading1"]))
 
     # Markdown-like 처리
+    # - 연속된 본문 줄(일반/글머리/굵게)은 <br/>로 이어 Paragraph 하나로 묶음
+    #   → 줄마다 Paragraph(XML 파싱 + wrap/split)를 만들지 않고, 제목이 나올 때만 끊어서 추가
+    body = []
+
+    def flush_body():
+        if body:
+            content.append(Paragraph("<br/>".join(body), styles["CustomBody"]))
+            body.clear()
+
     for line in answer.split("\n"):
         line = line.strip()
         if not line:
             continue
-        if line.startswith("# "):
-            content.append(Paragraph(line[2:], styles["CustomHeading1"]))
-        elif line.startswith("## "):
-            content.append(Paragraph(line[3:], styles["CustomHeading2"]))
-        elif line.startswith("- "):
-            content.append(Paragraph(f"• {line[2:]}", styles["CustomBody"]))
-        elif line.startswith("**"):
-            content.append(Paragraph(f"<b>{line}</b>", styles["CustomBody"]))
+        m = _MD_RE.match(line)
+        kind = m.lastgroup if m else None
+        heading = _MD_HEADINGS.get(kind)
+        if heading is not None:
+            style, cut = heading
+            flush_body()
+            content.append(Paragraph(line[cut:], styles[style]))
         else:
-            content.append(Paragraph(line, styles["CustomBody"]))
+            body.append(_MD_BODY[kind](line))
+    flush_body()
 
     content.append(Spacer(1, 20))
     content.append(Paragraph("──────────────────────────────", styles["CustomBody"]))
@@ -73,3 +161,63 @@ def save_report_pdf(path: str, title: str, question: str, answer: str):
 
     # ✅ PDF 빌드
     doc.build(content)
+    return buf.getvalue()
+
+
+def _render_report_pdf_fast(title: str, question: str, answer: str) -> bytes:
+    """
+    서식 없는 보고서용 canvas 렌더링 - platypus의 flowable 배치(wrap/split 2단계) 없이 줄 단위로 한 번에 그림
+    - 줄바꿈은 실제 글자 폭 기준(simpleSplit), 섹션마다 TextObject 하나로 출력
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    _register_font()
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    page_w, page_h = A4
+    left, right, top, bottom = 40, 40, 50, 40
+    max_w = page_w - left - right
+
+    # 🔹 제목 - CustomTitle과 같이 18pt/행간 24, 본문 폭에 맞춰 줄바꿈 후 가운데 정렬
+    c.setFont(_FONT_NAME, 18)
+    y = page_h - top - 18
+    for part in simpleSplit(title, _FONT_NAME, 18, max_w) or [""]:
+        c.drawCentredString(page_w / 2, y, part)
+        y -= 24
+
+    text = c.beginText(left, y - 6)
+    font = None  # TextObject에 마지막으로 설정한 (size, leading) - 같으면 Tf 연산자를 다시 내보내지 않음
+
+    def write(lines, size: float, leading: float):
+        nonlocal text, font
+        if font != (size, leading):
+            text.setFont(_FONT_NAME, size, leading)
+            font = (size, leading)
+        for line in lines:
+            for part in simpleSplit(line, _FONT_NAME, size, max_w) or [""]:
+                if text.getY() < bottom:  # 페이지 넘김
+                    c.drawText(text)
+                    c.showPage()
+                    # 새 페이지는 그래픽 상태가 초기화되므로 canvas에 한 번 설정 → 새 TextObject가 그대로 물려받음
+                    c.setFont(_FONT_NAME, size, leading)
+                    text = c.beginText(left, page_h - top)
+                text.textLine(part)
+
+    write([f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ""], 11, 16)
+
+    # 🔹 질문 섹션
+    write(["[질문]"], 14, 20)
+    write([line.strip() for line in question.split("\n") if line.strip()] + [""], 11, 16)
+
+    # 🔹 답변 섹션
+    write(["[답변]"], 14, 20)
+    write([line.strip() for line in answer.split("\n") if line.strip()], 11, 16)
+
+    write(["", "──────────────────────────────", "본 보고서는 LangChain 기반 AI 분석 결과입니다."], 11, 16)
+
+    c.drawText(text)
+    c.save()
+    return buf.getvalue()
@@ -0,0 +1,44 @@
+"""
+worker.py
+- 보고서 생성 작업 큐 워커 (arq + Redis)
+- API 프로세스(BackgroundTasks)와 분리된 별도 프로세스에서 보고서를 생성 → 워커를 여러 개 띄우면 PDF 렌더링이 병렬화됨
+- 서비스 인스턴스는 워커 시작 시 한 번만 생성해서 모든 작업이 공유
+
+실행:
+    arq app.worker.WorkerSettings
+
+환경변수:
+- REDIS_URL              : 작업 큐 Redis 주소 (기본: redis://localhost:6379)
+- REPORT_WORKER_JOBS     : 워커 하나가 동시에 처리할 작업 수 (기본: 4)
+"""
+
+import asyncio
+import os
+
+from arq.connections import RedisSettings
+from dotenv import load_dotenv
+
+from app.services.report_service import ReportService, InsuranceReportService
+
+load_dotenv()
+
+
+async def startup(ctx):
+    ctx["insurance_service"] = InsuranceReportService()
+    ctx["qa_service"] = ReportService()
+
+
+async def generate_insurance_report_pdf(ctx, **kwargs):
+    # 서비스 로직은 동기 코드이므로 스레드로 넘겨 워커 이벤트 루프(다른 작업)를 막지 않는다
+    return await asyncio.to_thread(ctx["insurance_service"].generate_insurance_report_pdf, **kwargs)
+
+
+async def generate_and_save_report(ctx, **kwargs):
+    return await asyncio.to_thread(ctx["qa_service"].generate_and_save_report, **kwargs)
+
+
+class WorkerSettings:
+    functions = [generate_insurance_report_pdf, generate_and_save_report]
+    on_startup = startup
+    redis_settings = RedisSettings.from_dsn(os.getenv("REDIS_URL", "redis://localhost:6379"))
+    max_jobs = int(os.getenv("REPORT_WORKER_JOBS", "4"))
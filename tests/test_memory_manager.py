@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import memory_manager
+from app.services.memory_manager import HISTORY_TURNS, MemoryManager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_manager, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_session_expires_after_ttl(clock):
+    mm = MemoryManager(max_sessions=10, ttl=60)
+    mm.ensure("a")
+    mm.add_user("a", "hello")
+
+    clock[0] += 59
+    assert mm.history_text("a") == "사용자: hello"  # 조회가 마지막 사용 시각을 갱신
+
+    clock[0] += 60
+    assert mm.history_text("a") == ""
+    assert "a" not in mm.sessions
+
+
+def test_expired_sessions_dropped_when_new_session_added(clock):
+    mm = MemoryManager(max_sessions=10, ttl=60)
+    mm.ensure("old")
+    clock[0] += 30
+    mm.ensure("recent")
+    clock[0] += 40  # old: 70초 경과(만료), recent: 40초
+    mm.ensure("new")
+    assert list(mm.sessions) == ["recent", "new"]
+
+
+def test_lru_eviction_drops_least_recently_used(clock):
+    mm = MemoryManager(max_sessions=2, ttl=3600)
+    mm.ensure("a")
+    mm.ensure("b")
+    mm.ensure("a")  # a를 최근 사용으로 갱신 → b가 가장 오래 안 쓴 세션
+    mm.ensure("c")
+    assert list(mm.sessions) == ["a", "c"]
+
+
+def test_window_trims_messages_and_history(clock):
+    mm = MemoryManager()
+    sid = mm.ensure(None)
+    for i in range(HISTORY_TURNS + 3):
+        mm.add_user(sid, f"q{i}")
+        mm.add_ai(sid, f"a{i}")
+
+    messages = mm.sessions[sid].chat_memory.messages
+    assert len(messages) == 2 * HISTORY_TURNS
+    assert messages[0].content == "q3"
+    lines = mm.history_text(sid).split("\n")
+    assert len(lines) == 2 * HISTORY_TURNS
+    assert lines[0] == "사용자: q3"
+    assert lines[-1] == f"AI: a{HISTORY_TURNS + 2}"
@@ -0,0 +1,114 @@
+import numpy as np
+
+from app.services.quantized_index import Int8VectorIndex
+
+
+def _vectors(n: int = 500, dim: int = 64, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def _exact_cosine(x: np.ndarray, q: np.ndarray) -> np.ndarray:
+    xn = x / np.linalg.norm(x, axis=1, keepdims=True)
+    return xn @ (q / np.linalg.norm(q))
+
+
+def _ids(n: int, prefix: str = "id") -> list:
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+def test_int8_topk_matches_exact_cosine(tmp_path):
+    x = _vectors()
+    index = Int8VectorIndex(str(tmp_path), "c")
+    index.add(_ids(len(x)), x)
+
+    queries = _vectors(20, seed=1)
+    overlap = 0
+    for q in queries:
+        sims = _exact_cosine(x, q)
+        exact = {f"id{i}" for i in np.argsort(-sims)[:10]}
+        hits = index.search(q, 10)
+        overlap += len(exact & {i for i, _ in hits})
+        for i, score in hits:  # scale 보정 후 점수 ≈ 코사인
+            assert abs(score - sims[int(i[2:])]) < 0.05
+    assert overlap / (10 * len(queries)) >= 0.9
+
+
+def test_oversample_rerank_orders_by_exact_cosine(tmp_path):
+    x = _vectors()
+    index = Int8VectorIndex(str(tmp_path), "c")
+    index.add(_ids(len(x)), x)
+
+    q = x[7] + 0.05 * _vectors(1, seed=2)[0]
+    sims = _exact_cosine(x, q)
+    hits = index.search(q, 5, oversample=4)
+
+    assert len(hits) == 5
+    assert hits[0][0] == "id7"
+    scores = [s for _, s in hits]
+    assert scores == sorted(scores, reverse=True)
+    for i, score in hits:  # FP16 재정렬 점수 ≈ FP32 코사인
+        assert abs(score - sims[int(i[2:])]) < 1e-2
+    assert [i for i, _ in hits] == [f"id{i}" for i in np.argsort(-sims)[:5]]
+
+
+def test_save_and_reload_round_trip(tmp_path):
+    x = _vectors()
+    index = Int8VectorIndex(str(tmp_path), "c")
+    index.add(_ids(len(x)), x)
+    index.save()
+
+    reloaded = Int8VectorIndex(str(tmp_path), "c")
+    index._consolidate()
+    assert len(reloaded) == len(index)
+    assert reloaded.ids.tolist() == index.ids.tolist()
+    assert np.array_equal(reloaded.codes, index.codes)
+    assert reloaded.scale == index.scale
+    q = _vectors(1, seed=3)[0]
+    assert reloaded.search(q, 5) == index.search(q, 5)
+
+
+def test_batched_adds_keep_codes_and_fp16_rows_aligned(tmp_path, monkeypatch):
+    from app.services import quantized_index
+
+    monkeypatch.setattr(quantized_index, "_COPY_ROWS", 7)  # 저장 시 기존 행을 여러 조각으로 복사하도록
+    x = _vectors(300)
+    index = Int8VectorIndex(str(tmp_path), "c")
+    for start in range(0, 200, 50):
+        index.add(_ids(300)[start : start + 50], x[start : start + 50])
+    assert len(index) == 200
+    assert index.search(x[120], 1)[0][0] == "id120"
+    index.save()
+
+    reopened = Int8VectorIndex(str(tmp_path), "c")
+    reopened.add(_ids(300)[200:], x[200:])
+    reopened.save()
+
+    final = Int8VectorIndex(str(tmp_path), "c")
+    assert final.ids.tolist() == _ids(300)
+    assert len(final.raw) == len(final.codes) == 300
+    raw = np.asarray(final.raw.base, dtype=np.float32)
+    # 행 순서가 같으면 FP16 사본을 다시 양자화한 값이 저장된 코드와 (반올림 오차 1 이내로) 일치
+    assert np.abs(final._quantize(raw).astype(np.int16) - final.codes.astype(np.int16)).max() <= 1
+    assert np.allclose(raw, x / np.linalg.norm(x, axis=1, keepdims=True), atol=1e-3)
+
+
+def test_rerank_reads_candidates_from_base_and_tail(tmp_path):
+    x = _vectors(100)
+    index = Int8VectorIndex(str(tmp_path), "c")
+    index.add(_ids(60), x[:60])
+    index.save()
+
+    reopened = Int8VectorIndex(str(tmp_path), "c")
+    reopened.add(_ids(100)[60:], x[60:])  # 60.. 은 아직 저장 전(tail), 0..59는 memmap(base)
+    assert len(reopened.raw.base) == 60
+
+    q = x[10] + x[80]
+    sims = _exact_cosine(x, q)
+    positions = np.array([10, 80, 3, 95])
+    ranked = reopened.raw.rerank(q, positions, k=4)
+    assert [p for p, _ in ranked] == sorted(positions.tolist(), key=lambda p: -sims[p])
+    for p, score in ranked:
+        assert abs(score - sims[p]) < 1e-2
+
+    hits = reopened.search(q, 2, oversample=4)
+    assert {i for i, _ in hits} == {"id10", "id80"}
@@ -0,0 +1,32 @@
+from langchain.schema import Document
+
+from app.chains.rag_chain import _dedup_near_duplicates
+
+_CLAUSE = "제3조(보험금의 지급) 회사는 피보험자가 선박 화재로 인하여 입은 손해를 이 약관에 따라 보상한다. " * 3
+
+
+def _docs(*texts):
+    return [Document(page_content=t, metadata={"i": i}) for i, t in enumerate(texts)]
+
+
+def test_near_duplicates_dropped_keeping_first():
+    docs = _docs(_CLAUSE, _CLAUSE.replace("보상한다.", "보상한다!", 1), "  ".join(_CLAUSE.split(" ")))
+    kept = _dedup_near_duplicates(docs, 0.85)
+    assert [d.metadata["i"] for d in kept] == [0]
+
+
+def test_distinct_chunks_kept_in_order():
+    docs = _docs(
+        "유류유출 방제 기준과 해양환경관리법 제22조의 신고 의무",
+        _CLAUSE,
+        "선원법에 따른 재해 보상 범위와 산재보험 적용 기준",
+        _CLAUSE,
+    )
+    kept = _dedup_near_duplicates(docs, 0.85)
+    assert [d.metadata["i"] for d in kept] == [0, 1, 2]
+
+
+def test_texts_shorter_than_shingle_size():
+    docs = _docs("abc", "abc", "xyz", "")
+    kept = _dedup_near_duplicates(docs, 0.85)
+    assert [d.metadata["i"] for d in kept] == [0, 2, 3]
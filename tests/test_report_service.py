@@ -0,0 +1,12 @@
+from app.services import report_service
+
+
+def test_render_pdf_inline_when_pool_disabled(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(report_service, "_PDF_PROCESSES", 0)
+    monkeypatch.setattr(report_service, "save_report_pdf", lambda path, **kw: calls.append((path, kw)))
+
+    path = str(tmp_path / "r.pdf")
+    report_service._render_pdf(path, title="t", question="q", answer="a")
+
+    assert calls == [(path, {"title": "t", "question": "q", "answer": "a"})]
@@ -0,0 +1,31 @@
+import importlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("REPORTS_DIR", str(tmp_path))  # 라우터 import 시 서비스가 보고서 폴더를 만들고 훑음
+    reports = importlib.import_module("app.api.reports")
+    app = FastAPI()
+    app.include_router(reports.router)
+    return TestClient(app)
+
+
+def test_invalid_incident_body_returns_fastapi_422_shape(client):
+    res = client.post("/generate/insurance", json={"incident_type": "fire", "top_k": "many"})
+
+    assert res.status_code == 422
+    detail = res.json()["detail"]
+    assert all(err["loc"][0] == "body" for err in detail)
+    assert {tuple(err["loc"]) for err in detail} >= {("body", "description"), ("body", "location"), ("body", "top_k")}
+    assert all("url" not in err for err in detail)
+
+
+def test_malformed_json_returns_422(client):
+    res = client.post("/generate/insurance", content=b"{not json", headers={"content-type": "application/json"})
+
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"][0] == "body"
@@ -0,0 +1,22 @@
+from app.services.vectorstore import _EMBED_BATCH_ITEMS, _EMBED_BATCH_TOKENS, _embedding_batches
+
+
+def test_embedding_batches_empty_input():
+    assert _embedding_batches([]) == []
+
+
+def test_embedding_batches_exact_multiple_of_item_limit():
+    texts = ["x"] * (2 * _EMBED_BATCH_ITEMS)
+    assert _embedding_batches(texts) == [(0, _EMBED_BATCH_ITEMS), (_EMBED_BATCH_ITEMS, 2 * _EMBED_BATCH_ITEMS)]
+
+
+def test_embedding_batches_oversized_text_gets_own_batch():
+    big = "x" * (_EMBED_BATCH_TOKENS + 1)
+    # 한 개만으로 한도를 넘는 텍스트도 버리지 않고 단독 배치로 보냄
+    assert _embedding_batches([big]) == [(0, 1)]
+    assert _embedding_batches(["a", big, "b"]) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_embedding_batches_split_on_character_budget():
+    half = "x" * (_EMBED_BATCH_TOKENS // 2)
+    assert _embedding_batches([half, half, "y"]) == [(0, 2), (2, 3)]